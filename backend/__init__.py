@@ -4,4 +4,10 @@
 __version__ = "1.0.0"
 __author__ = "AmberPipeline Team"
 
-from .server import app
+
+def __getattr__(name):
+    # 首次访问 backend.app 时才导入服务模块，导入包本身（如 pytest 收集 backend/tests）不创建服务
+    if name == "app":
+        from .server import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Image Cache Module - 图像缓存
+按 (路径, 修改时间, 读取标志) 缓存 cv2.imread 的解码结果，
+避免对同一文件重复解码（批量处理、多参数尝试等场景）；
+并提供按字节预算淘汰的通用 LRU 缓存和内容哈希，用于缓存推理结果
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# 默认缓存上限（字节）
+DEFAULT_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+def content_hash(data: bytes) -> bytes:
+    """
+    计算数据的内容哈希，安装了 blake3 时使用 SIMD 加速的 BLAKE3，否则使用 BLAKE2b
+
+    Args:
+        data: 待哈希的字节数据
+
+    Returns:
+        哈希摘要
+    """
+    if blake3 is not None:
+        return blake3.blake3(data).digest()
+    return hashlib.blake2b(data, digest_size=32).digest()
+
+
+def nbytes_of(value) -> int:
+    """
+    估算缓存值占用的字节数，支持 ndarray 和 PIL Image
+
+    Args:
+        value: 缓存值
+
+    Returns:
+        字节数
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "getbands"):
+        return value.width * value.height * len(value.getbands())
+    return 0
+
+
+class ByteBudgetCache:
+    """
+    按字节预算淘汰的线程安全 LRU 缓存
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES, getsizeof=nbytes_of):
+        """
+        初始化缓存
+
+        Args:
+            budget_bytes: 缓存占用的最大字节数
+            getsizeof: 计算缓存值字节数的函数
+        """
+        self.budget_bytes = budget_bytes
+        self._getsizeof = getsizeof
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def set_budget(self, budget_bytes: int):
+        """
+        调整缓存上限，超出部分立即淘汰
+
+        Args:
+            budget_bytes: 缓存占用的最大字节数
+        """
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def get(self, key):
+        """
+        读取缓存，命中时标记为最近使用
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存值，未命中时返回 None
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """
+        写入缓存，超过预算的单个值不缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+        """
+        size = self._getsizeof(value)
+        with self._lock:
+            if key in self._entries or size > self.budget_bytes:
+                return
+            self._entries[key] = value
+            self._total_bytes += size
+            self._evict()
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _evict(self):
+        """
+        淘汰最久未使用的条目直到满足字节预算（调用方需持有锁）
+        """
+        while self._total_bytes > self.budget_bytes and self._entries:
+            _, value = self._entries.popitem(last=False)
+            self._total_bytes -= self._getsizeof(value)
+
+
+class DecodeCache(ByteBudgetCache):
+    """
+    图像解码缓存
+    缓存中的数组被设置为只读，调用方如需修改必须先 copy()
+    """
+
+    def load(self, path: str, flags: int = cv2.IMREAD_COLOR):
+        """
+        读取图像，命中缓存时直接返回已解码的数组
+
+        Args:
+            path: 图像路径
+            flags: cv2.imread 读取标志
+
+        Returns:
+            只读的 ndarray，读取失败时返回 None
+        """
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        key = (os.path.abspath(path), mtime, flags)
+        image = self.get(key)
+        if image is not None:
+            return image
+
+        image = cv2.imread(path, flags)
+        if image is None:
+            return None
+        image.setflags(write=False)
+
+        self.put(key, image)
+        return image
+
+
+# 进程级共享解码缓存
+decode_cache = DecodeCache()
+
+
+def load_bgr(path: str) -> np.ndarray:
+    """
+    读取彩色图像 (BGR)，使用共享解码缓存
+
+    Args:
+        path: 图像路径
+
+    Returns:
+        只读的 BGR ndarray，读取失败时返回 None
+    """
+    return decode_cache.load(path, cv2.IMREAD_COLOR)
+
+
+def load_gray(path: str) -> np.ndarray:
+    """
+    读取灰度图像，使用共享解码缓存
+
+    Args:
+        path: 图像路径
+
+    Returns:
+        只读的灰度 ndarray，读取失败时返回 None
+    """
+    return decode_cache.load(path, cv2.IMREAD_GRAYSCALE)
@@ -6,12 +6,33 @@ Inpainting Module - 图像修复模块
 
 import os
 import logging
+import logging.handlers
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image
 import cv2
 
+from modules.image_cache import decode_cache
+from modules.mask_utils import dilate_rect, rect_kernels
+
 logger = logging.getLogger(__name__)
 
+# 分块修复时允许的最大连通域数量，超过后合并为一个区域
+MAX_INPAINT_TILES = 64
+# 遮罩覆盖比例超过该值时跳过修复
+MAX_MASK_COVERAGE = 0.95
+# 处理后遮罩缓存的最大条目数
+MASK_CACHE_SIZE = 8
+# 缩小倍数 -> (彩色读取标志, 灰度读取标志)，JPEG 可在解码阶段直接缩小
+REDUCED_READ_FLAGS = {
+    1: (cv2.IMREAD_COLOR, cv2.IMREAD_GRAYSCALE),
+    2: (cv2.IMREAD_REDUCED_COLOR_2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+    4: (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    8: (cv2.IMREAD_REDUCED_COLOR_8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+}
+
 
 class InpaintingProcessor:
     """
@@ -31,6 +52,18 @@ class InpaintingProcessor:
         self.use_lama = use_lama
         self.lama_model = None
         
+        # 处理后（缩放、二值化、膨胀）的遮罩缓存，键为 (路径, 修改时间, 尺寸, padding)
+        self._mask_cache = OrderedDict()
+        self._mask_cache_lock = threading.Lock()
+        
+        # 按 padding 缓存膨胀使用的结构元素
+        self._se_cache: dict[int, tuple] = {}
+        
+        # 解码缓存上限（MB），可通过配置调整
+        cache_mb = getattr(config, "image_cache_mb", None)
+        if cache_mb is not None:
+            decode_cache.set_budget(int(cache_mb) * 1024 * 1024)
+        
         if use_lama:
             try:
                 self._load_lama_model()
@@ -54,7 +87,7 @@ class InpaintingProcessor:
             raise ImportError("LaMa model not available. Please install lama-cleaner package.")
     
     def inpaint(self, image_path: str, mask_path: str, method: str = "telea", 
-                radius: int = 3, padding: int = 10) -> Image.Image:
+                radius: int = 3, padding: int = 10, return_format: str = "pil"):
         """
         执行图像修复
         
@@ -64,52 +97,262 @@ class InpaintingProcessor:
             method: 修复方法 ("telea", "ns", "lama")
             radius: 修复半径（仅用于 OpenCV 方法）
             padding: 遮罩扩展像素数
+            return_format: 返回格式，"pil" 返回 PIL Image，"ndarray" 返回 BGR ndarray
             
         Returns:
-            修复后的 PIL Image 对象
+            修复后的 PIL Image 对象或 BGR ndarray
         """
         try:
-            # 读取图像
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Failed to load image: {image_path}")
+            result = self._inpaint_bgr(image_path, mask_path, method, radius, padding)
             
-            # 读取遮罩
-            mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
-            if mask is None:
-                raise ValueError(f"Failed to load mask: {mask_path}")
-            
-            # 确保遮罩和图像尺寸一致
-            if mask.shape[:2] != image.shape[:2]:
-                mask = cv2.resize(mask, (image.shape[1], image.shape[0]))
-            
-            # 扩展遮罩（添加 padding）
-            if padding > 0:
-                kernel = np.ones((padding * 2 + 1, padding * 2 + 1), np.uint8)
-                mask = cv2.dilate(mask, kernel, iterations=1)
-            
-            # 二值化遮罩
-            _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+            logger.info(f"Inpainting completed using {method} method")
+            return self._to_output(result, return_format)
             
-            # 执行修复
-            if method == "lama" and self.use_lama:
-                result = self._inpaint_with_lama(image, mask)
-            elif method == "ns":
-                result = cv2.inpaint(image, mask, radius, cv2.INPAINT_NS)
-            else:  # telea (default)
-                result = cv2.inpaint(image, mask, radius, cv2.INPAINT_TELEA)
+        except Exception as e:
+            logger.error(f"Inpainting failed: {str(e)}")
+            raise
+    
+    def inpaint_array(self, image: np.ndarray, mask: np.ndarray, method: str = "telea",
+                      radius: int = 3, padding: int = 10, return_format: str = "pil"):
+        """
+        对内存中的图像执行修复，无需经过文件
+        
+        Args:
+            image: 原始图像 (BGR)
+            mask: 遮罩图像（灰度或 BGR，白色区域将被修复）
+            method: 修复方法 ("telea", "ns", "lama")
+            radius: 修复半径（仅用于 OpenCV 方法）
+            padding: 遮罩扩展像素数
+            return_format: 返回格式，"pil" 返回 PIL Image，"ndarray" 返回 BGR ndarray
             
-            # 转换为 PIL Image
-            result_rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-            result_pil = Image.fromarray(result_rgb)
+        Returns:
+            修复后的 PIL Image 对象或 BGR ndarray
+        """
+        try:
+            if mask.ndim == 3:
+                mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
+            mask = self._binarize_mask(mask, image.shape[:2], padding)
+            result = self._inpaint_prepared(image, mask, method, radius)
             
             logger.info(f"Inpainting completed using {method} method")
-            return result_pil
+            return self._to_output(result, return_format)
             
         except Exception as e:
             logger.error(f"Inpainting failed: {str(e)}")
             raise
     
+    @staticmethod
+    def _to_output(result: np.ndarray, return_format: str):
+        """
+        按返回格式转换修复结果
+        
+        Args:
+            result: 修复后的图像 (BGR)
+            return_format: "pil" 或 "ndarray"
+            
+        Returns:
+            PIL Image（RGB）或原样返回的 BGR ndarray
+        """
+        if return_format == "ndarray":
+            return result
+        if return_format != "pil":
+            raise ValueError(f"Unsupported return format: {return_format}")
+        return Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB))
+    
+    def _inpaint_bgr(self, image_path: str, mask_path: str, method: str,
+                     radius: int, padding: int, scale: int = 1) -> np.ndarray:
+        """
+        执行图像修复，返回 BGR ndarray（供单张和批量修复共用）
+        
+        Args:
+            image_path: 原始图像路径
+            mask_path: 遮罩图像路径
+            method: 修复方法
+            radius: 修复半径
+            padding: 遮罩扩展像素数
+            scale: 解码时的缩小倍数（1、2、4、8），radius 和 padding 同比缩小
+            
+        Returns:
+            修复后的图像 (BGR)
+        """
+        color_flags, gray_flags = REDUCED_READ_FLAGS[scale]
+        if scale > 1:
+            radius = max(1, radius // scale)
+            padding = max(1, padding // scale) if padding > 0 else 0
+        
+        # 读取图像（缓存中的数组只读，cv2.inpaint 不会修改输入）
+        image = decode_cache.load(image_path, color_flags)
+        if image is None:
+            raise ValueError(f"Failed to load image: {image_path}")
+        
+        # 读取并处理遮罩
+        mask = self._prepare_mask(mask_path, image.shape[:2], padding, gray_flags)
+        
+        return self._inpaint_prepared(image, mask, method, radius)
+    
+    def _inpaint_prepared(self, image: np.ndarray, mask: np.ndarray,
+                          method: str, radius: int) -> np.ndarray:
+        """
+        使用处理好的二值遮罩执行修复
+        
+        Args:
+            image: 输入图像 (BGR)
+            mask: 与图像同尺寸的二值遮罩
+            method: 修复方法
+            radius: 修复半径
+            
+        Returns:
+            修复后的图像 (BGR)
+        """
+        # 遮罩为空时无需修复；遮罩几乎覆盖整张图时没有可用的上下文，修复结果无意义
+        masked = cv2.countNonZero(mask)
+        if masked == 0:
+            return image.copy()
+        if masked > MAX_MASK_COVERAGE * mask.size:
+            logger.warning(f"Mask covers {masked / mask.size:.0%} of the image, skipping inpainting")
+            return image.copy()
+        
+        # 执行修复
+        if method == "lama" and self.use_lama:
+            return self._inpaint_with_lama(image, mask)
+        elif method == "ns":
+            return self._inpaint_opencv(image, mask, radius, cv2.INPAINT_NS)
+        else:  # telea (default)
+            return self._inpaint_opencv(image, mask, radius, cv2.INPAINT_TELEA)
+    
+    def _prepare_mask(self, mask_path: str, shape: tuple, padding: int,
+                      flags: int = cv2.IMREAD_GRAYSCALE) -> np.ndarray:
+        """
+        读取遮罩并缩放、二值化、膨胀，结果按 (路径, 修改时间, 尺寸, padding) 缓存
+        同一遮罩应用于多张图像时只处理一次；返回的数组只读，cv2.inpaint 不会修改它
+        
+        Args:
+            mask_path: 遮罩图像路径
+            shape: 目标尺寸 (height, width)
+            padding: 遮罩扩展像素数
+            flags: 遮罩读取标志
+            
+        Returns:
+            可直接用于修复的二值遮罩
+        """
+        try:
+            key = (os.path.abspath(mask_path), os.path.getmtime(mask_path), tuple(shape), padding, flags)
+        except OSError:
+            raise ValueError(f"Failed to load mask: {mask_path}")
+        
+        with self._mask_cache_lock:
+            mask = self._mask_cache.get(key)
+            if mask is not None:
+                self._mask_cache.move_to_end(key)
+                return mask
+        
+        mask = decode_cache.load(mask_path, flags)
+        if mask is None:
+            raise ValueError(f"Failed to load mask: {mask_path}")
+        
+        mask = self._binarize_mask(mask, shape, padding)
+        mask.setflags(write=False)
+        
+        with self._mask_cache_lock:
+            self._mask_cache[key] = mask
+            while len(self._mask_cache) > MASK_CACHE_SIZE:
+                self._mask_cache.popitem(last=False)
+        return mask
+    
+    def _binarize_mask(self, mask: np.ndarray, shape: tuple, padding: int) -> np.ndarray:
+        """
+        将遮罩缩放到目标尺寸、二值化并膨胀，不修改输入数组
+        
+        Args:
+            mask: 灰度遮罩
+            shape: 目标尺寸 (height, width)
+            padding: 遮罩扩展像素数
+            
+        Returns:
+            可直接用于修复的二值遮罩
+        """
+        # 分割结果等遮罩通常已是 {0,255} 二值图，最近邻缩放不会引入中间值，可跳过阈值化
+        is_binary = cv2.countNonZero(cv2.inRange(mask, 1, 254)) == 0
+        
+        # 确保遮罩和图像尺寸一致，并二值化遮罩
+        # 先二值化再膨胀：{0,255} 遮罩膨胀后仍是二值的，无需再次阈值化
+        resized = mask.shape[:2] != tuple(shape)
+        if resized:
+            mask = cv2.resize(mask, (shape[1], shape[0]),
+                              interpolation=cv2.INTER_NEAREST)
+        if not is_binary:
+            if resized:
+                cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY, dst=mask)
+            else:
+                # 输入可能是缓存中的只读遮罩，输出到新数组
+                _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+        
+        # 扩展遮罩（添加 padding）
+        if padding > 0:
+            mask = dilate_rect(mask, padding, self._se(padding))
+        
+        return mask
+    
+    def _se(self, padding: int) -> tuple:
+        """
+        获取指定 padding 的膨胀结构元素，首次使用时生成
+        
+        Args:
+            padding: 遮罩扩展像素数
+            
+        Returns:
+            (水平结构元素, 垂直结构元素)
+        """
+        kernels = self._se_cache.get(padding)
+        if kernels is None:
+            kernels = self._se_cache.setdefault(padding, rect_kernels(padding))
+        return kernels
+    
+    def _inpaint_opencv(self, image: np.ndarray, mask: np.ndarray,
+                        radius: int, flags: int) -> np.ndarray:
+        """
+        使用 OpenCV 修复，只处理遮罩所在区域
+        每个连通域取外接矩形并向外扩展 max(radius, 16) 像素作为上下文，
+        遮罩区域较大时回退到整图修复
+        
+        Args:
+            image: 输入图像 (BGR)
+            mask: 二值遮罩
+            radius: 修复半径
+            flags: cv2.INPAINT_TELEA 或 cv2.INPAINT_NS
+            
+        Returns:
+            修复后的图像 (BGR)
+        """
+        height, width = mask.shape[:2]
+        margin = max(radius, 16)
+        
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if count - 1 > MAX_INPAINT_TILES:
+            # 碎片过多时合并为一个外接矩形
+            boxes = [cv2.boundingRect(mask)]
+        else:
+            # 第 0 个连通域为背景
+            boxes = [tuple(stat[:4]) for stat in stats[1:]]
+        
+        tiles = []
+        tiles_area = 0
+        for x, y, w, h in boxes:
+            x0, y0 = max(0, x - margin), max(0, y - margin)
+            x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+            tiles.append((x0, y0, x1, y1))
+            tiles_area += (x1 - x0) * (y1 - y0)
+        
+        if not tiles or tiles_area > 0.5 * height * width:
+            return cv2.inpaint(image, mask, radius, flags)
+        
+        result = image.copy()
+        for x0, y0, x1, y1 in tiles:
+            result[y0:y1, x0:x1] = cv2.inpaint(
+                result[y0:y1, x0:x1], mask[y0:y1, x0:x1], radius, flags
+            )
+        return result
+    
     def _inpaint_with_lama(self, image: np.ndarray, mask: np.ndarray) -> np.ndarray:
         """
         使用 LaMa 模型进行修复
@@ -134,7 +377,8 @@ class InpaintingProcessor:
     
     def inpaint_with_preview(self, image_path: str, mask_path: str, 
                             method: str = "telea", radius: int = 3, 
-                            padding: int = 10, preview_size: tuple = None) -> dict:
+                            padding: int = 10, preview_size: tuple = None,
+                            preview_only: bool = False) -> dict:
         """
         执行图像修复并生成预览
         
@@ -145,19 +389,39 @@ class InpaintingProcessor:
             radius: 修复半径
             padding: 遮罩扩展像素数
             preview_size: 预览图像尺寸 (width, height)，None 表示使用原始尺寸
+            preview_only: 只生成预览；预览足够小时在缩小解码的图像上修复，
+                此时 full_image 为 None，需要时再调用 inpaint 生成完整图像
             
         Returns:
             包含完整图像和预览图像的字典
         """
         try:
+            scale = self._preview_scale(image_path, preview_size) if preview_only else 1
+            if scale > 1:
+                # 在缩小解码的图像上修复，预览即为结果
+                reduced = self._inpaint_bgr(image_path, mask_path, method, radius, padding, scale)
+                preview = self._to_output(reduced, "pil")
+                preview.thumbnail(preview_size, Image.Resampling.LANCZOS)
+                return {
+                    "success": True,
+                    "full_image": None,
+                    "preview_image": preview,
+                    "method": method,
+                    "radius": radius,
+                    "padding": padding
+                }
+            
             # 执行修复
             result = self.inpaint(image_path, mask_path, method, radius, padding)
             
-            # 生成预览
+            # 生成预览：按比例缩放到 preview_size 以内，resize 只分配缩小后的图像，
+            # 不必先复制完整尺寸的结果再 thumbnail
             preview = result
             if preview_size:
-                preview = result.copy()
-                preview.thumbnail(preview_size, Image.Resampling.LANCZOS)
+                ratio = min(preview_size[0] / result.width, preview_size[1] / result.height)
+                if ratio < 1:
+                    size = (max(1, round(result.width * ratio)), max(1, round(result.height * ratio)))
+                    preview = result.resize(size, Image.Resampling.LANCZOS)
             
             return {
                 "success": True,
@@ -175,8 +439,35 @@ class InpaintingProcessor:
                 "error": str(e)
             }
     
+    @staticmethod
+    def _preview_scale(image_path: str, preview_size: tuple) -> int:
+        """
+        计算生成预览时可使用的最大解码缩小倍数
+        
+        Args:
+            image_path: 原始图像路径
+            preview_size: 预览图像尺寸 (width, height)
+            
+        Returns:
+            缩小倍数（1、2、4、8），缩小后的图像仍不小于预览尺寸
+        """
+        if not preview_size:
+            return 1
+        try:
+            # 只读取文件头获取尺寸
+            with Image.open(image_path) as header:
+                width, height = header.size
+        except Exception:
+            return 1
+        
+        for scale in (8, 4, 2):
+            if width // scale >= preview_size[0] and height // scale >= preview_size[1]:
+                return scale
+        return 1
+    
     def batch_inpaint(self, image_mask_pairs: list, method: str = "telea", 
-                     radius: int = 3, padding: int = 10) -> list:
+                     radius: int = 3, padding: int = 10,
+                     return_format: str = "ndarray") -> list:
         """
         批量执行图像修复
         
@@ -185,29 +476,46 @@ class InpaintingProcessor:
             method: 修复方法
             radius: 修复半径
             padding: 遮罩扩展像素数
+            return_format: 结果格式，默认 "ndarray"（BGR，可直接 cv2.imwrite），
+                "pil" 返回 PIL Image
             
         Returns:
             修复结果列表
         """
-        results = []
+        if not image_mask_pairs:
+            return []
         
-        for i, (image_path, mask_path) in enumerate(image_mask_pairs):
+        total = len(image_mask_pairs)
+        
+        def process_item(i, pair):
+            image_path, mask_path = pair
             try:
-                logger.info(f"Processing batch item {i+1}/{len(image_mask_pairs)}")
-                result = self.inpaint(image_path, mask_path, method, radius, padding)
-                results.append({
+                result = self._inpaint_bgr(image_path, mask_path, method, radius, padding)
+                logger.info(f"Batch item {i+1}/{total} completed")
+                return {
                     "success": True,
-                    "image": result,
+                    "image": self._to_output(result, return_format),
                     "index": i
-                })
+                }
             except Exception as e:
                 logger.error(f"Batch inpainting failed for item {i}: {str(e)}")
-                results.append({
+                return {
                     "success": False,
                     "error": str(e),
                     "index": i
-                })
+                }
+        
+        # 按遮罩路径分组提交，使用同一遮罩的条目依次命中遮罩缓存
+        order = sorted(range(total), key=lambda i: str(image_mask_pairs[i][1]))
+        
+        # cv2.inpaint 在 C 层释放 GIL，线程池即可并行处理互不相关的条目
+        max_workers = min(total, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                process_item, order, [image_mask_pairs[i] for i in order]
+            ))
         
+        results.sort(key=lambda r: r["index"])
         return results
     
     def get_available_methods(self) -> list:
@@ -248,6 +556,57 @@ class InpaintingProcessor:
             return pixels / 1000000  # 约 1 秒处理 1M 像素
 
 
+# 进程池工作进程中的处理器实例，由 init_worker 创建
+_worker_processor = None
+
+
+def init_worker(config, log_queue=None, log_level=logging.INFO):
+    """
+    进程池初始化函数，在每个工作进程中配置日志并创建一次处理器
+    子进程从父进程继承（或重新导入时创建）的根日志器处理器会写入一个没有监听线程消费的队列，
+    记录会一直堆积在子进程内存中，因此先替换掉这些处理器
+    
+    Args:
+        config: 配置对象
+        log_queue: 父进程监听的 multiprocessing 队列，为 None 时直接输出到标准错误
+        log_level: 根日志器级别
+    """
+    global _worker_processor
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    if log_queue is not None:
+        # 完整格式由父进程的监听处理器添加
+        handler = logging.handlers.QueueHandler(log_queue)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(log_level)
+    
+    _worker_processor = InpaintingProcessor(config, use_lama=False)
+
+
+def inpaint_in_worker(image: np.ndarray, mask: np.ndarray, method: str,
+                      radius: int, padding: int) -> np.ndarray:
+    """
+    在进程池工作进程中执行 OpenCV 修复
+    
+    Args:
+        image: 原始图像 (BGR)
+        mask: 遮罩图像
+        method: 修复方法 ("telea", "ns")
+        radius: 修复半径
+        padding: 遮罩扩展像素数
+        
+    Returns:
+        修复后的图像 (BGR)
+    """
+    return _worker_processor.inpaint_array(image, mask, method, radius, padding,
+                                           return_format="ndarray")
+
+
 if __name__ == "__main__":
     # 测试代码
     logging.basicConfig(level=logging.INFO)
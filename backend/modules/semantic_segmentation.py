@@ -7,10 +7,81 @@
 import cv2
 import numpy as np
 from typing import List, Dict, Any, Tuple
-import os
+import math
 import tempfile
+import threading
 from PIL import Image
 
+from modules.image_cache import load_bgr, load_gray
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# 边缘吸附搜索半径（像素）
+SNAP_RADIUS = 50
+# 图像长边不小于该值时在 1/2 分辨率上计算边缘
+SNAP_PYRAMID_MIN_SIZE = 1024
+# 半分辨率吸附结果映射回原图后，在原图边缘上校正的范围（像素）
+SNAP_REFINE_RADIUS = 1
+# 点数超过该值时改用距离变换一次性求解所有点
+SNAP_DISTANCE_TRANSFORM_MIN_POINTS = 20
+# 关节补全时边界框每边外扩的像素数
+JOINT_EXPANSION_PAD = 6
+
+
+def _closest_edge_scan(edges, x, y, radius):
+    """
+    逐像素扫描点周围的方形窗口，返回最近边缘点 (x, y, 距离平方)
+    没有边缘点时距离平方为 INT32_MAX
+    """
+    height, width = edges.shape
+    y0, y1 = max(0, y - radius), min(height, y + radius + 1)
+    x0, x1 = max(0, x - radius), min(width, x + radius + 1)
+    best_x, best_y, best_d2 = x, y, 2147483647
+    for yy in range(y0, y1):
+        dy = yy - y
+        for xx in range(x0, x1):
+            if edges[yy, xx] != 0:
+                dx = xx - x
+                d2 = dx * dx + dy * dy
+                if d2 < best_d2:
+                    best_x, best_y, best_d2 = xx, yy, d2
+    return best_x, best_y, best_d2
+
+
+# Numba 编译后的 _closest_edge_scan，首次使用时编译（导入本模块不触发编译）
+_compiled_edge_scan = None
+_compile_lock = threading.Lock()
+
+
+def _edge_scan_kernel():
+    """
+    返回 Numba 编译的边缘扫描函数，首次调用时编译；未安装 Numba 时返回 None
+    """
+    global _compiled_edge_scan
+    if njit is None:
+        return None
+    if _compiled_edge_scan is None:
+        with _compile_lock:
+            if _compiled_edge_scan is None:
+                scan = njit(fastmath=True)(_closest_edge_scan)
+                scan(np.zeros((3, 3), dtype=np.uint8), 1, 1, 1)
+                _compiled_edge_scan = scan
+    return _compiled_edge_scan
+
+
+def warm_up_edge_scan():
+    """
+    预先编译边缘扫描函数（服务启动时在后台线程调用），避免首次吸附请求承担编译开销
+    
+    Returns:
+        bool: 是否使用 Numba 编译版本
+    """
+    return _edge_scan_kernel() is not None
+
+
 class SemanticSegmentation:
     """
     语义分割类
@@ -43,36 +114,50 @@ class SemanticSegmentation:
             points (List[Dict[str, float]]): 点列表
             label (str): 标签类型 ('foreground' or 'background')
         
+        Returns:
+            Dict[str, Any]: 吸附结果
+        """
+        # 直接以灰度读取图像，省去彩色解码和颜色转换
+        gray = load_gray(image_path)
+        if gray is None:
+            return {'success': False, 'error': '无法读取图像'}
+        
+        return self.perform_edge_snap_array(gray, points, label)
+    
+    def perform_edge_snap_array(self, image: np.ndarray, points, label: str) -> Dict[str, Any]:
+        """
+        对内存中的图像执行边缘自动吸附
+        
+        Args:
+            image (np.ndarray): 灰度或 BGR 图像
+            points: 点列表 (List[Dict[str, float]]) 或 (N, 2) 坐标数组
+            label (str): 标签类型 ('foreground' or 'background')
+        
         Returns:
             Dict[str, Any]: 吸附结果
         """
         try:
-            # 读取图像
-            image = cv2.imread(image_path)
-            if image is None:
-                return {'success': False, 'error': '无法读取图像'}
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
             
-            # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # 计算边缘；大图在 1/2 分辨率上计算，吸附半径同比缩小
+            scale = 2 if max(gray.shape[:2]) >= SNAP_PYRAMID_MIN_SIZE else 1
+            edges = cv2.Canny(cv2.pyrDown(gray) if scale > 1 else gray, 100, 200)
+            radius = SNAP_RADIUS // scale
             
-            # 计算边缘
-            edges = cv2.Canny(gray, 100, 200)
+            # 查找每个点附近最近的边缘点，没有找到时使用原始点
+            if isinstance(points, np.ndarray):
+                coords = list(map(tuple, points.astype(np.int64).tolist()))
+            else:
+                coords = [(int(point['x']), int(point['y'])) for point in points]
+            scaled = [(x // scale, y // scale) for x, y in coords]
+            if len(scaled) > SNAP_DISTANCE_TRANSFORM_MIN_POINTS:
+                snapped = self._snap_points_distance_transform(edges, scaled, radius)
+            else:
+                snapped = [self._snap_point(edges, x, y, radius) for x, y in scaled]
             
-            # 查找每个点附近的边缘
-            snapped_points = []
-            for point in points:
-                x, y = int(point['x']), int(point['y'])
-                
-                # 在点周围查找边缘点
-                edge_points = self._find_closest_edge_points(edges, (x, y), radius=50)
-                
-                if edge_points:
-                    # 找到最近的边缘点
-                    closest_edge = min(edge_points, key=lambda p: self._distance((x, y), p))
-                    snapped_points.append({'x': closest_edge[0], 'y': closest_edge[1]})
-                else:
-                    # 如果没有找到边缘点，使用原始点
-                    snapped_points.append({'x': x, 'y': y})
+            if scale > 1:
+                snapped = self._refine_snapped_points(gray, coords, scaled, snapped, scale)
+            snapped_points = [{'x': x, 'y': y} for x, y in snapped]
             
             return {
                 'success': True,
@@ -81,7 +166,144 @@ class SemanticSegmentation:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def perform_joint_expansion(self, image_path: str, bbox: Dict[str, float], label: str) -> Dict[str, Any]:
+    def _snap_point(self, edges: np.ndarray, x: int, y: int, radius: int) -> Tuple[int, int]:
+        """
+        在点周围的方形窗口内查找最近的边缘点
+        
+        Args:
+            edges (np.ndarray): Canny 边缘图
+            x (int): 点的 x 坐标
+            y (int): 点的 y 坐标
+            radius (int): 搜索半径
+        
+        Returns:
+            Tuple[int, int]: 最近边缘点坐标，窗口内没有边缘时返回原始点
+        """
+        scan = _edge_scan_kernel()
+        if scan is not None:
+            # Numba 编译后的标量扫描比 NumPy 的临时数组分配更快
+            best_x, best_y, _ = scan(edges, x, y, radius)
+            return int(best_x), int(best_y)
+        
+        height, width = edges.shape[:2]
+        x0, x1 = max(0, x - radius), min(width, x + radius + 1)
+        y0, y1 = max(0, y - radius), min(height, y + radius + 1)
+        if x1 <= x0 or y1 <= y0:
+            # 窗口完全在图像外；负数的切片终点会从另一侧取值，不能直接切片
+            return x, y
+        
+        ys, xs = np.nonzero(edges[y0:y1, x0:x1])
+        if ys.size == 0:
+            return x, y
+        
+        dy = ys.astype(np.int32) + (y0 - y)
+        dx = xs.astype(np.int32) + (x0 - x)
+        closest = int(np.argmin(dy * dy + dx * dx))
+        return int(xs[closest]) + x0, int(ys[closest]) + y0
+    
+    def _refine_snapped_points(self, gray: np.ndarray, coords: List[Tuple[int, int]],
+                               scaled: List[Tuple[int, int]], snapped: List[Tuple[int, int]],
+                               scale: int) -> List[Tuple[int, int]]:
+        """
+        将半分辨率上的吸附结果映射回原图并逐点校正
+        
+        Args:
+            gray (np.ndarray): 原分辨率灰度图
+            coords (List[Tuple[int, int]]): 原始点坐标
+            scaled (List[Tuple[int, int]]): 缩小后的点坐标
+            snapped (List[Tuple[int, int]]): 缩小图上的吸附结果
+            scale (int): 缩小倍数
+        
+        Returns:
+            List[Tuple[int, int]]: 原图上的吸附结果，未吸附的点保持原始坐标
+        """
+        def refine(index):
+            if snapped[index] == scaled[index]:
+                return coords[index]
+            x, y = snapped[index]
+            return self._refine_snap(gray, x * scale, y * scale)
+        
+        return [refine(i) for i in range(len(coords))]
+    
+    def _refine_snap(self, gray: np.ndarray, x: int, y: int) -> Tuple[int, int]:
+        """
+        将半分辨率上找到的边缘点校正到原图边缘上
+        只在候选点周围的小窗口内计算原分辨率边缘
+        
+        Args:
+            gray (np.ndarray): 原分辨率灰度图
+            x (int): 映射回原图的 x 坐标
+            y (int): 映射回原图的 y 坐标
+        
+        Returns:
+            Tuple[int, int]: 校正后的坐标，附近没有原图边缘时返回输入坐标
+        """
+        # 留出 Canny 梯度计算需要的上下文
+        context = SNAP_REFINE_RADIUS + 8
+        height, width = gray.shape[:2]
+        x0, y0 = max(0, x - context), max(0, y - context)
+        x1, y1 = min(width, x + context + 1), min(height, y + context + 1)
+        if x0 >= x1 or y0 >= y1:
+            return x, y
+        
+        edges = cv2.Canny(gray[y0:y1, x0:x1], 100, 200)
+        ex, ey = self._snap_point(edges, x - x0, y - y0, SNAP_REFINE_RADIUS)
+        return ex + x0, ey + y0
+    
+    def _snap_points_distance_transform(self, edges: np.ndarray, coords: List[Tuple[int, int]],
+                                        radius: int) -> List[Tuple[int, int]]:
+        """
+        通过距离变换一次性为多个点查找最近的边缘点
+        结果与逐点的 _snap_point 一致：在同一方形窗口内取欧氏距离最近的边缘点
+        （距离相同的多个边缘点之间可能选择不同的一个）
+        
+        Args:
+            edges (np.ndarray): Canny 边缘图
+            coords (List[Tuple[int, int]]): 点坐标列表
+            radius (int): 搜索半径（方形窗口的半边长）
+        
+        Returns:
+            List[Tuple[int, int]]: 吸附后的点坐标，窗口内没有边缘的点保持不变
+        """
+        edge_ys, edge_xs = np.nonzero(edges)
+        if edge_ys.size == 0:
+            return list(coords)
+        
+        # 边缘像素为 0 的图上做距离变换：精确距离 (DIST_MASK_PRECISE) 用于判断，
+        # 带 labels 的变换只支持近似掩码，其给出的最近边缘像素只作为候选，需要校验
+        inverted = cv2.bitwise_not(edges)
+        dist = cv2.distanceTransform(inverted, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+        _, labels = cv2.distanceTransformWithLabels(
+            inverted, cv2.DIST_L2, 5, labelType=cv2.DIST_LABEL_PIXEL
+        )
+        label_to_coord = np.zeros((int(labels.max()) + 1, 2), dtype=np.int32)
+        label_to_coord[labels[edge_ys, edge_xs], 0] = edge_xs
+        label_to_coord[labels[edge_ys, edge_xs], 1] = edge_ys
+        
+        # 方形窗口内任一边缘点的距离都不超过 radius·√2
+        max_dist = radius * math.sqrt(2) + 1e-3
+        height, width = edges.shape[:2]
+        snapped = []
+        for x, y in coords:
+            if not (0 <= x < width and 0 <= y < height):
+                snapped.append(self._snap_point(edges, x, y, radius))
+                continue
+            nearest = float(dist[y, x])
+            if nearest > max_dist:
+                snapped.append((x, y))
+                continue
+            edge_x, edge_y = (int(v) for v in label_to_coord[labels[y, x]])
+            dx, dy = edge_x - x, edge_y - y
+            if max(abs(dx), abs(dy)) <= radius and abs(math.hypot(dx, dy) - nearest) < 1e-3:
+                # 候选是全图最近的边缘点且位于窗口内，因此也是窗口内最近的
+                snapped.append((edge_x, edge_y))
+            else:
+                # 近似候选不是最近点，或最近点在窗口外：退回逐点扫描
+                snapped.append(self._snap_point(edges, x, y, radius))
+        return snapped
+    
+    def perform_joint_expansion(self, image_path: str, bbox: Dict[str, float], label: str,
+                                serialize: bool = False) -> Dict[str, Any]:
         """
         执行关节补全
         
@@ -89,16 +311,35 @@ class SemanticSegmentation:
             image_path (str): 图像路径
             bbox (Dict[str, float]): 边界框
             label (str): 标签类型 ('foreground' or 'background')
+            serialize (bool, optional): 是否将遮罩写入临时 PNG 文件. Defaults to False.
         
         Returns:
-            Dict[str, Any]: 补全结果
+            Dict[str, Any]: 补全结果，expandedMask 默认为遮罩 ndarray，
+                serialize=True 时为临时 PNG 文件路径
+        """
+        # 读取图像
+        image = load_bgr(image_path)
+        if image is None:
+            return {'success': False, 'error': '无法读取图像'}
+        
+        return self.perform_joint_expansion_array(image, bbox, label, serialize)
+    
+    def perform_joint_expansion_array(self, image: np.ndarray, bbox: Dict[str, float], label: str,
+                                      serialize: bool = False) -> Dict[str, Any]:
+        """
+        对内存中的图像执行关节补全
+        
+        Args:
+            image (np.ndarray): 输入图像，只使用其尺寸
+            bbox (Dict[str, float]): 边界框
+            label (str): 标签类型 ('foreground' or 'background')
+            serialize (bool, optional): 是否将遮罩写入临时 PNG 文件. Defaults to False.
+        
+        Returns:
+            Dict[str, Any]: 补全结果，expandedMask 默认为遮罩 ndarray，
+                serialize=True 时为临时 PNG 文件路径
         """
         try:
-            # 读取图像
-            image = cv2.imread(image_path)
-            if image is None:
-                return {'success': False, 'error': '无法读取图像'}
-            
             # 获取边界框坐标
             x = int(bbox['x'])
             y = int(bbox['y'])
@@ -111,18 +352,28 @@ class SemanticSegmentation:
             width = min(width, image.shape[1] - x)
             height = min(height, image.shape[0] - y)
             
-            # 创建遮罩
-            mask = np.zeros(image.shape[:2], dtype=np.uint8)
-            cv2.rectangle(mask, (x, y), (x + width, y + height), 255, -1)
+            # 创建遮罩：填充矩形膨胀后仍是矩形，直接绘制外扩后的矩形
+            # （等价于 5x5 矩形核膨胀 3 次，每边外扩 6 像素）
+            pad = JOINT_EXPANSION_PAD
+            image_height, image_width = image.shape[:2]
+            x0, y0 = max(0, x - pad), max(0, y - pad)
+            x1 = min(image_width, x + width + pad + 1)
+            y1 = min(image_height, y + height + pad + 1)
+            expanded_mask = np.zeros((image_height, image_width), dtype=np.uint8)
+            expanded_mask[y0:y1, x0:x1] = 255
             
-            # 应用膨胀操作来实现关节补全
-            kernel = np.ones((5, 5), np.uint8)
-            expanded_mask = cv2.dilate(mask, kernel, iterations=3)
+            if not serialize:
+                return {
+                    'success': True,
+                    'expandedMask': expanded_mask
+                }
             
-            # 保存结果
-            temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-            cv2.imwrite(temp_file.name, expanded_mask)
-            temp_file.close()
+            # 保存结果；二值遮罩使用 1 级压缩，体积几乎不变但编码快得多
+            ok, buffer = cv2.imencode('.png', expanded_mask, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+            if not ok:
+                return {'success': False, 'error': '无法编码遮罩'}
+            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
+                temp_file.write(buffer.tobytes())
             
             return {
                 'success': True,
@@ -141,4 +392,152 @@ class SemanticSegmentation:
         
         Returns:
             Dict[str, Any]: 预设应用结果
-        """
\ No newline at end of file
+        """
+        # 读取图像
+        image = load_bgr(image_path)
+        if image is None:
+            return {'success': False, 'error': '无法读取图像'}
+        
+        return self.apply_part_preset_array(image, preset_id)
+    
+    def apply_part_preset_array(self, image: np.ndarray, preset_id: str) -> Dict[str, Any]:
+        """
+        对内存中的图像应用部位预设
+        
+        Args:
+            image (np.ndarray): 输入图像，只使用其尺寸
+            preset_id (str): 预设ID ('human' or 'quadruped')
+        
+        Returns:
+            Dict[str, Any]: 预设应用结果，每个部位的 mask 为遮罩 ndarray
+        """
+        try:
+            # 简化实现，实际应该调用AI模型
+            height, width = image.shape[:2]
+            
+            # 根据预设ID生成不同的部位遮罩
+            if preset_id == 'human':
+                parts = self._generate_human_parts(width, height)
+            elif preset_id == 'quadruped':
+                parts = self._generate_quadruped_parts(width, height)
+            else:
+                return {'success': False, 'error': f'未知的预设ID: {preset_id}'}
+            
+            result_parts = []
+            for part in parts:
+                mask = np.zeros((height, width), dtype=np.uint8)
+                if part['type'] == 'head':
+                    # 头部 - 圆形
+                    cv2.circle(mask, (width//2, height//4), height//8, 255, -1)
+                elif part['type'] == 'body':
+                    # 身体 - 矩形
+                    cv2.rectangle(mask, (width//3, height//3), (2*width//3, 3*height//4), 255, -1)
+                elif part['type'] == 'leftArm':
+                    cv2.rectangle(mask, (width//4, height//3), (width//3, height//2), 255, -1)
+                elif part['type'] == 'rightArm':
+                    cv2.rectangle(mask, (2*width//3, height//3), (3*width//4, height//2), 255, -1)
+                elif part['type'] == 'leftLeg':
+                    cv2.rectangle(mask, (width//3, 3*height//4), (width//2, height), 255, -1)
+                elif part['type'] == 'rightLeg':
+                    cv2.rectangle(mask, (width//2, 3*height//4), (2*width//3, height), 255, -1)
+                
+                result_parts.append({
+                    'name': part['name'],
+                    'type': part['type'],
+                    'mask': mask
+                })
+            
+            return {
+                'success': True,
+                'parts': result_parts
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def process_semantic_brush(self, image_path: str, strokes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        处理语义涂抹
+        
+        Args:
+            image_path (str): 图像路径
+            strokes (List[Dict[str, Any]]): 笔触列表
+        
+        Returns:
+            Dict[str, Any]: 处理结果
+        """
+        # 读取图像
+        image = load_bgr(image_path)
+        if image is None:
+            return {'success': False, 'error': '无法读取图像'}
+        
+        return self.process_semantic_brush_array(image, strokes)
+    
+    def process_semantic_brush_array(self, image: np.ndarray, strokes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        对内存中的图像处理语义涂抹
+        
+        Args:
+            image (np.ndarray): 输入图像，只使用其尺寸
+            strokes (List[Dict[str, Any]]): 笔触列表
+        
+        Returns:
+            Dict[str, Any]: 处理结果，semanticMask 为遮罩 ndarray
+        """
+        try:
+            height, width = image.shape[:2]
+            mask = np.zeros((height, width), dtype=np.uint8)
+            
+            # 绘制圆形笔触，橡皮擦模式清除遮罩
+            for stroke in strokes:
+                color = 0 if stroke['mode'] == 'eraser' else 255
+                cv2.circle(mask, (int(stroke['x']), int(stroke['y'])), int(stroke['size'])//2, color, -1)
+            
+            # 应用高斯模糊平滑遮罩
+            smoothed_mask = cv2.GaussianBlur(mask, (15, 15), 0)
+            
+            return {
+                'success': True,
+                'semanticMask': smoothed_mask
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def _generate_human_parts(self, width: int, height: int) -> List[Dict[str, str]]:
+        """
+        生成人体部位列表
+        
+        Args:
+            width (int): 宽度
+            height (int): 高度
+        
+        Returns:
+            List[Dict[str, str]]: 部位列表
+        """
+        return [
+            {'name': '头部', 'type': 'head'},
+            {'name': '身体', 'type': 'body'},
+            {'name': '左臂', 'type': 'leftArm'},
+            {'name': '右臂', 'type': 'rightArm'},
+            {'name': '左腿', 'type': 'leftLeg'},
+            {'name': '右腿', 'type': 'rightLeg'}
+        ]
+    
+    def _generate_quadruped_parts(self, width: int, height: int) -> List[Dict[str, str]]:
+        """
+        生成四足动物部位列表
+        
+        Args:
+            width (int): 宽度
+            height (int): 高度
+        
+        Returns:
+            List[Dict[str, str]]: 部位列表
+        """
+        return [
+            {'name': '头部', 'type': 'head'},
+            {'name': '身体', 'type': 'body'},
+            {'name': '左前腿', 'type': 'leftArm'},
+            {'name': '右前腿', 'type': 'rightArm'},
+            {'name': '左后腿', 'type': 'leftLeg'},
+            {'name': '右后腿', 'type': 'rightLeg'}
+        ]
@@ -6,87 +6,347 @@ AmberPipeline AI - FastAPI Backend Server
 
 import os
 import sys
+import queue
+import multiprocessing
 import logging
+import logging.handlers
+import asyncio
+import importlib
+import threading
 import base64
 from io import BytesIO
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 import numpy as np
+import cv2
+import anyio.to_thread
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import Response, JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, ConfigDict, Field
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pybase64
+except ImportError:
+    pybase64 = None
+
+# Base64 编解码优先使用 SIMD 加速的 pybase64，接口与标准库 base64 一致
+b64 = pybase64 if pybase64 is not None else base64
 
 # 导入现有的模块
 from config import Config
-from modules.segmentation import SAMSegmenter
 from modules.normal_map import NormalMapGenerator
 from modules.workflow_manager import WorkflowManager
-from modules.inpainting import InpaintingProcessor
-from modules.semantic_segmentation import SemanticSegmentation
+from modules.inpainting import InpaintingProcessor, init_worker, inpaint_in_worker
+from modules.semantic_segmentation import SemanticSegmentation, warm_up_edge_scan
+from modules.image_cache import ByteBudgetCache, content_hash
 
-# 配置日志
+# 配置日志（LOG_LEVEL 环境变量控制级别，生产环境可设为 WARNING）
+# 请求线程只把日志记录放入队列，文件和控制台写入由监听线程完成
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_file_handler = logging.FileHandler('backend_server.log')
+log_file_handler.setFormatter(log_formatter)
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(log_formatter)
+log_queue = queue.SimpleQueue()
+# 监听线程在服务启动时开启（见 start_services），之前的日志记录暂存在队列中
+log_listener = logging.handlers.QueueListener(log_queue, log_file_handler, log_stream_handler)
+# 入队时只合并消息参数，完整格式由监听线程中的处理器添加，避免重复的级别和名称前缀
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('backend_server.log'),
-        logging.StreamHandler()
-    ]
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    handlers=[log_queue_handler]
 )
 logger = logging.getLogger(__name__)
 
 # 初始化配置
-config = Config()
+config = Config.get()
+
+# 服务端是否启用 LaMa 修复（目前只使用 OpenCV 方法）
+INPAINT_USE_LAMA = False
+
+def create_sam_segmenter(cfg):
+    """
+    获取 SAM 分割器；torch/SAM2 的导入耗时数秒，延迟到首次使用或后台预热时进行
+    与工作流管理器共享同一实例，模型权重只加载一次
+    
+    Args:
+        cfg: 配置对象
+        
+    Returns:
+        SAMSegmenter 实例
+    """
+    from modules.segmentation import SAMSegmenter
+    return SAMSegmenter.shared(cfg)
+
+# AI模型工厂，模型在首次使用时创建
+MODEL_FACTORIES = {
+    "sam": create_sam_segmenter,
+    "normal": NormalMapGenerator,
+    "inpainting": lambda cfg: InpaintingProcessor(cfg, use_lama=INPAINT_USE_LAMA),
+    "semantic": SemanticSegmentation,
+}
 
-# 延迟加载AI模型，只在需要时初始化
-sam_segmenter = None
-normal_generator = None
-inpainting_processor = None
-semantic_segmenter = None
+class ModelRegistry:
+    """
+    AI模型注册表
+    按需创建模型，每个模型一把 asyncio.Lock，保证并发的首次请求只创建一个实例
+    """
+    
+    def __init__(self, config, factories: dict):
+        """
+        初始化模型注册表
+        
+        Args:
+            config: 配置对象
+            factories: 模型名称到工厂函数的映射
+        """
+        self._config = config
+        self._factories = factories
+        self._locks = {name: asyncio.Lock() for name in factories}
+        self._models = {}
+    
+    async def get(self, name: str):
+        """
+        获取模型，未加载时在工作线程中创建
+        
+        Args:
+            name: 模型名称
+            
+        Returns:
+            模型实例
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        
+        async with self._locks[name]:
+            if name not in self._models:
+                logger.info("Loading %s model...", name)
+                self._models[name] = await anyio.to_thread.run_sync(self._factories[name], self._config)
+                logger.info("%s model loaded successfully", name)
+            return self._models[name]
+
+model_registry = ModelRegistry(config, MODEL_FACTORIES)
+
+# 推理结果缓存，按 (端点, 输入内容哈希, 参数) 缓存，交互式重复请求无需重新推理
+result_cache = ByteBudgetCache(int(os.getenv("RESULT_CACHE_MB", "512")) * 1024 * 1024)
+
+# OpenCV 修复是纯 CPU 计算，使用进程池在多核上并行处理
+INPAINT_WORKERS = int(os.getenv("INPAINT_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
 logger.info("AI models will be loaded on demand")
 
-# 初始化工作流管理器
-logger.info("Initializing workflow manager...")
-workflow_manager = WorkflowManager(config)
-logger.info("Workflow manager initialized successfully")
+# 修复进程池和工作流管理器在服务启动时创建（见 start_services）：
+# spawn 方式启动的进程池子进程会以 __mp_main__ 重新导入本模块，导入时不能有这些副作用。
+# 未触发生命周期事件时（如嵌入其他应用），修复改在线程中执行，工作流管理器在首次使用时创建
+inpaint_pool = None
+workflow_manager = None
+workflow_manager_lock = threading.Lock()
+# 修复进程池工作进程的日志经 multiprocessing 队列发回，由同一组处理器写出
+worker_log_queue = None
+worker_log_listener = None
+# 启动事件可能在同一进程中触发多次（如多次进入 TestClient），监听线程只启动一次
+log_listener_running = False
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    服务生命周期：启动时创建后台服务并预热，关闭时释放
+    """
+    start_services()
+    configure_inference_threads()
+    # 在后台线程中导入重模块、编译边缘扫描函数，不阻塞启动，首次请求无需等待
+    threading.Thread(target=prewarm_imports, name="prewarm-imports", daemon=True).start()
+    threading.Thread(target=warm_up_edge_scan, name="prewarm-edge-scan", daemon=True).start()
+    await preload_models()
+    try:
+        yield
+    finally:
+        stop_services()
 
 # 创建FastAPI应用
+# 响应体中含有数 MB 的 Base64 字符串，安装了 orjson 时使用其序列化
 app = FastAPI(
     title="AmberPipeline AI API",
     description="FastAPI backend for SAM segmentation and Normal Map generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
 )
 
-# 配置CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 在生产环境中应该设置为具体的前端URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# 配置CORS：CORS_ORIGINS 为逗号分隔的允许来源，默认包含前端开发服务器和打包后的桌面应用
+# （Electron 以 file:// 加载页面，请求的 Origin 为 "null" 或 "file://"）；
+# 设为空字符串时（前后端同源部署）不安装 CORS 中间件
+DEFAULT_CORS_ORIGINS = "http://localhost:3000,http://127.0.0.1:3000,null,file://"
+cors_origins = [o for o in os.getenv("CORS_ORIGINS", DEFAULT_CORS_ORIGINS).split(",") if o]
+if cors_origins:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=cors_origins,
+        allow_credentials=False,
+        allow_methods=["GET", "POST"],
+        allow_headers=["*"],
+        expose_headers=["X-Method", "X-Radius", "X-Padding"],
+        max_age=86400,
+    )
+
+class JSONGZipMiddleware:
+    """
+    对 JSON 响应（包含 Base64 图像）做快速 gzip 压缩；
+    请求图像二进制（Accept: image/*）的响应本身已是压缩格式，直接跳过
+    """
+    
+    def __init__(self, app, minimum_size: int = 4096, compresslevel: int = 1):
+        """
+        初始化中间件
+        
+        Args:
+            app: 下游 ASGI 应用
+            minimum_size: 小于该字节数的响应不压缩
+            compresslevel: gzip 压缩级别，1 级速度最快
+        """
+        self.app = app
+        self.gzip_app = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not wants_image_response(Request(scope)):
+            await self.gzip_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+app.add_middleware(JSONGZipMiddleware, minimum_size=4096, compresslevel=1)
+
+# 后台预先导入的重模块（torch、SAM2）
+PREWARM_MODULES = ("modules.segmentation",)
+
+def prewarm_imports():
+    """
+    导入 PREWARM_MODULES 中的模块，失败时只记录日志（模型在首次使用时会再次报错）
+    """
+    for module_name in PREWARM_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning("Failed to prewarm %s: %s", module_name, e)
+
+def start_services():
+    """
+    启动日志监听线程，创建修复进程池和工作流管理器
+    """
+    global inpaint_pool, worker_log_queue, worker_log_listener, log_listener_running
+    if not log_listener_running:
+        log_listener.start()
+        log_listener_running = True
+    
+    if inpaint_pool is None:
+        worker_log_queue = multiprocessing.Queue()
+        worker_log_listener = logging.handlers.QueueListener(worker_log_queue, log_file_handler, log_stream_handler)
+        worker_log_listener.start()
+        inpaint_pool = ProcessPoolExecutor(
+            max_workers=INPAINT_WORKERS,
+            initializer=init_worker,
+            initargs=(config, worker_log_queue, logging.getLogger().level)
+        )
+    
+    get_workflow_manager()
+
+def stop_services():
+    """
+    关闭修复进程池，停止日志监听线程并写完队列中剩余的日志
+    """
+    global inpaint_pool, worker_log_queue, worker_log_listener, log_listener_running
+    if inpaint_pool is not None:
+        inpaint_pool.shutdown(wait=False, cancel_futures=True)
+        inpaint_pool = None
+    if worker_log_listener is not None:
+        worker_log_listener.stop()
+        worker_log_listener = None
+        worker_log_queue.close()
+        worker_log_queue = None
+    if log_listener_running:
+        log_listener.stop()
+        log_listener_running = False
+
+def get_workflow_manager() -> WorkflowManager:
+    """
+    获取工作流管理器，首次调用时创建
+    
+    Returns:
+        工作流管理器实例
+    """
+    global workflow_manager
+    with workflow_manager_lock:
+        if workflow_manager is None:
+            logger.info("Initializing workflow manager...")
+            workflow_manager = WorkflowManager(config)
+            logger.info("Workflow manager initialized successfully")
+        return workflow_manager
+
+async def preload_models():
+    """
+    预加载 MODEL_PRELOAD 环境变量中列出的模型（逗号分隔，如 "sam,inpainting"）
+    """
+    for name in os.getenv("MODEL_PRELOAD", "").split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in MODEL_FACTORIES:
+            logger.warning("Unknown model in MODEL_PRELOAD: %s", name)
+            continue
+        await model_registry.get(name)
+
+def configure_inference_threads():
+    """
+    按 INFERENCE_THREADS 环境变量限制推理使用的线程数（例如与 GPU 并发能力一致）
+    """
+    inference_threads = os.getenv("INFERENCE_THREADS")
+    if inference_threads:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = int(inference_threads)
+        logger.info("Inference thread limit set to %s", inference_threads)
 
 # 请求模型
+# 请求模型：具体的元素类型让 pydantic-core 生成快速校验器，extra='forbid' 直接拒绝未知字段
 class SegmentationRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     image_data: str
-    points: list = []
-    point_labels: list = []
+    points: List[Tuple[int, int]] = Field(default_factory=list)
+    point_labels: List[int] = Field(default_factory=list)
 
 class NormalMapRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     image_data: str
-    strength: float = None
+    strength: Optional[float] = None
 
 class InpaintingRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     image_data: str
     mask_data: str
     method: str = "telea"
     radius: int = 3
     padding: int = 10
 
+# 图像类端点可选的返回格式；默认 PNG 无损，JPEG 需显式指定（色度抽样会破坏法线贴图的方向数据）
+OutputFormat = Literal["png", "jpeg", "jpg"]
+
 class BatchConfigRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    
     max_parallel_tasks: int
 
 # 辅助函数
@@ -101,47 +361,162 @@ def base64_to_image(base64_str: str) -> Image.Image:
         PIL Image对象
     """
     try:
-        # 移除Base64前缀
-        if base64_str.startswith('data:image/'):
-            base64_str = base64_str.split(',')[1]
+        # 移除Base64前缀（只切片一次，不拆分整个字符串）
+        if base64_str.startswith('data:'):
+            base64_str = base64_str[base64_str.index(',') + 1:]
         
         # 解码Base64数据
-        image_data = base64.b64decode(base64_str)
+        image_data = b64.b64decode(base64_str)
         
         # 转换为PIL Image
         image = Image.open(BytesIO(image_data))
         
         return image
     except Exception as e:
-        logger.error(f"Failed to convert base64 to image: {str(e)}")
+        logger.error("Failed to convert base64 to image: %s", e)
         raise HTTPException(status_code=400, detail="Invalid image data")
 
-def image_to_base64(image: Image.Image, format: str = 'PNG') -> str:
+def encode_image(image: Image.Image, format: str = 'PNG', quality: int = 90) -> tuple:
+    """
+    将PIL Image对象编码为图像文件字节
+    
+    Args:
+        image: PIL Image对象
+        format: 图像格式，'PNG'（无损，低压缩级别快速编码）或 'JPEG'（适合照片类结果）
+        quality: JPEG 质量
+        
+    Returns:
+        (包含图像数据的字节流, MIME 类型)
+    """
+    format = format.upper()
+    if format == 'JPG':
+        format = 'JPEG'
+    
+    # 创建字节流
+    buffer = BytesIO()
+    
+    # 保存图像到字节流
+    if format == 'PNG':
+        # 1 级压缩比默认的 6 级快数倍，体积略大
+        image.save(buffer, format='PNG', compress_level=1, optimize=False)
+    elif format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, format='JPEG', quality=quality, subsampling=2)
+    else:
+        image.save(buffer, format=format)
+    
+    return buffer, f"image/{format.lower()}"
+
+def image_to_base64(image: Image.Image, format: str = 'PNG', quality: int = 90) -> str:
     """
     将PIL Image对象转换为Base64字符串
     
     Args:
         image: PIL Image对象
-        format: 图像格式
+        format: 图像格式，'PNG' 或 'JPEG'
+        quality: JPEG 质量
         
     Returns:
         Base64编码的图像字符串
     """
     try:
-        # 创建字节流
-        buffer = BytesIO()
+        buffer, media_type = encode_image(image, format, quality)
         
-        # 保存图像到字节流
-        image.save(buffer, format=format)
+        # 直接对字节流的内存视图编码，避免 getvalue() 复制；前缀与编码结果只拼接一次
+        with buffer.getbuffer() as raw:
+            encoded = b64.b64encode(raw)
+        return (f"data:{media_type};base64,".encode('ascii') + encoded).decode('ascii')
+    except Exception as e:
+        logger.error("Failed to convert image to base64: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to process image")
+
+def wants_image_response(request: Request) -> bool:
+    """
+    客户端是否通过 Accept 头请求直接返回图像二进制（如 "Accept: image/*"）
+    
+    Args:
+        request: 请求对象
         
-        # 编码为Base64
-        base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    Returns:
+        是否返回图像二进制
+    """
+    return "image/" in request.headers.get("accept", "")
+
+def image_response(image: Image.Image, format: str = 'PNG', headers: dict = None) -> Response:
+    """
+    将PIL Image对象作为图像二进制响应返回，省去Base64和JSON编码
+    
+    Args:
+        image: PIL Image对象
+        format: 图像格式
+        headers: 附加的响应头（用于传递元数据）
         
-        # 添加前缀
-        return f"data:image/{format.lower()};base64,{base64_str}"
+    Returns:
+        图像响应
+    """
+    try:
+        buffer, media_type = encode_image(image, format)
     except Exception as e:
-        logger.error(f"Failed to convert image to base64: {str(e)}")
+        logger.error("Failed to encode image: %s", e)
         raise HTTPException(status_code=500, detail="Failed to process image")
+    return Response(content=buffer.getvalue(), media_type=media_type, headers=headers)
+
+def upload_to_ndarray(data: bytes, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """
+    将上传的图像字节直接解码为 ndarray，无需写入临时文件
+    
+    Args:
+        data: 图像文件字节
+        flags: cv2.imdecode 读取标志，默认解码为 BGR
+        
+    Returns:
+        解码后的 ndarray
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    return image
+
+def upload_to_image(data: bytes) -> Image.Image:
+    """
+    将上传的图像字节直接解码为 PIL 图像（保持原始模式），无需写入临时文件
+    
+    Args:
+        data: 图像文件字节
+        
+    Returns:
+        已完成解码的 PIL 图像
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        image.load()
+        return image
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+
+def parse_numbers(text: str, columns: int = 1, dtype=np.float32) -> np.ndarray:
+    """
+    将 "x1,y1;x2,y2;..." 格式的数值字符串一次性解析为 ndarray
+    
+    Args:
+        text: 以逗号和分号分隔的数值字符串
+        columns: 每行的数值个数，大于 1 时返回 (N, columns) 数组
+        dtype: 数组类型
+        
+    Returns:
+        解析后的 ndarray
+        
+    Raises:
+        HTTPException: 含有非数值项或数值个数不是 columns 的整数倍时返回 400
+    """
+    try:
+        values = np.array(text.replace(';', ',').split(','), dtype=dtype)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid numeric list: {text}") from None
+    if values.size % columns:
+        raise HTTPException(status_code=400, detail=f"Invalid numeric list: {text}")
+    return values.reshape(-1, columns) if columns > 1 else values
 
 # API端点
 @app.get("/")
@@ -161,254 +536,221 @@ def root():
         ]
     }
 
-@app.post("/segment")
-def segment_image(
-    image: UploadFile = File(...),
-    points: str = Query(None),
-    point_labels: str = Query(None)
-):
+async def _run_op(name: str, op, cache_key: tuple, request: Request = None,
+                  output_format: str = 'PNG', extra: dict = None, headers: dict = None):
     """
-    执行图像分割（背景移除）
+    生成图像类端点的公共流程：查询结果缓存 → 执行操作 → 写入缓存 → 返回图像二进制或 Base64 JSON
     
     Args:
-        image: 上传的图像文件
-        points: 点坐标列表，格式："x1,y1;x2,y2;..."
-        point_labels: 点标签列表，格式："0,1;1,0;..."
+        name: 操作名称，用于日志和错误信息
+        op: 无参协程函数，返回 PIL 图像，失败时返回 None
+        cache_key: 结果缓存键
+        request: 请求对象，Accept 为 image/* 时直接返回图像二进制；为 None 时总是返回 JSON
+        output_format: 返回图像格式
+        extra: 附加到 JSON 响应中的字段
+        headers: 图像二进制响应的附加响应头
         
     Returns:
-        分割后的图像Base64字符串
+        图像 Response，或包含 Base64 图像的字典
     """
     try:
-        logger.info(f"Received segmentation request for image: {image.filename}")
-        
-        # 确保SAM模型已加载
-        global sam_segmenter
-        if sam_segmenter is None:
-            logger.info("Loading SAM segmenter model...")
-            from modules.segmentation import SAMSegmenter
-            sam_segmenter = SAMSegmenter(config)
-            logger.info("SAM segmenter model loaded successfully")
-        
-        # 读取图像文件
-        image_data = image.file.read()
-        image = Image.open(BytesIO(image_data))
-        
-        # 保存临时图像用于处理，使用唯一文件名避免冲突
-        temp_path = f"temp_segmentation_input_{id(image)}.png"
-        image.save(temp_path)
-        
-        # 处理点坐标
-        if points and point_labels:
-            # 解析点坐标
-            points_list = [tuple(map(int, p.split(','))) for p in points.split(';')]
-            # 解析点标签
-            labels_list = [tuple(map(int, l.split(','))) for l in point_labels.split(';')]
-            
-            logger.info(f"Using point prompts: {points_list}, labels: {labels_list}")
-            
-            # 使用带有点提示的分割
-            result = sam_segmenter.segment_with_points(temp_path, points_list, labels_list)
-        else:
-            # 使用自动分割
-            result = sam_segmenter.segment(temp_path)
-        
-        # 删除临时文件
-        os.remove(temp_path)
-        
+        # 相同输入和参数的重复请求直接返回缓存结果
+        result = result_cache.get(cache_key)
         if result is None:
-            raise HTTPException(status_code=500, detail="Segmentation failed")
+            result = await op()
+            if result is None:
+                raise HTTPException(status_code=500, detail=f"{name} failed")
+            result_cache.put(cache_key, result)
+        
+        if request is not None and wants_image_response(request):
+            return await anyio.to_thread.run_sync(image_response, result, output_format, headers)
         
         # 转换为Base64
-        result_base64 = image_to_base64(result)
+        result_base64 = await anyio.to_thread.run_sync(image_to_base64, result, output_format)
         
-        logger.info(f"Segmentation completed successfully for image: {image.filename}")
+        logger.info("%s completed successfully", name)
         
         return {
             "success": True,
-            "image": result_base64
+            "image": result_base64,
+            **(extra or {})
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Segmentation error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Segmentation failed: {str(e)}")
+        logger.error("%s error: %s", name, e)
+        raise HTTPException(status_code=500, detail=f"{name} failed: {str(e)}")
+
+@app.post("/segment")
+async def segment_image(
+    image: UploadFile = File(...),
+    points: str = Query(None),
+    point_labels: str = Query(None)
+):
+    """
+    执行图像分割（背景移除）
+    
+    Args:
+        image: 上传的图像文件
+        points: 点坐标列表，格式："x1,y1;x2,y2;..."
+        point_labels: 点标签列表，格式："0,1;1,0;..."
+        
+    Returns:
+        分割后的图像Base64字符串
+    """
+    logger.info("Received segmentation request for image: %s", image.filename)
+    image_data = await image.read()
+    
+    # 解析点坐标和点标签，直接得到连续数组交给 SAM；格式错误时在加载模型前返回 400
+    use_points = bool(points and point_labels)
+    if use_points:
+        points_np = parse_numbers(points, 2, np.int32)
+        labels_np = parse_numbers(point_labels, 1, np.int32)
+    
+    async def op():
+        # 获取SAM模型（首次使用时加载）
+        sam_segmenter = await model_registry.get("sam")
+        
+        if use_points:
+            logger.info("Using point prompts: %s, labels: %s", points_np.tolist(), labels_np.tolist())
+            
+            # 使用带有点提示的分割，图像在工作线程中解码，无需临时文件
+            def segment_with_points():
+                image_rgb = np.asarray(upload_to_image(image_data).convert('RGB'))
+                return sam_segmenter.segment_with_points_array(image_rgb, points_np, labels_np)
+            return await anyio.to_thread.run_sync(segment_with_points)
+        
+        # 使用自动分割，上传的图像在工作线程中解码后直接交给 SAM
+        return await anyio.to_thread.run_sync(lambda: sam_segmenter.segment(upload_to_image(image_data)))
+    
+    cache_key = ("segment", content_hash(image_data), points, point_labels)
+    return await _run_op("Segmentation", op, cache_key)
 
 @app.post("/generate-normal-map")
-def generate_normal_map(
+async def generate_normal_map(
+    request: Request,
     image: UploadFile = File(...),
-    strength: float = Query(None)
+    strength: float = Query(None),
+    output_format: OutputFormat = Query("png", description="Result image format: png (lossless) or jpeg")
 ):
     """
     生成法线贴图
     
     Args:
+        request: 请求对象，Accept 为 image/* 时直接返回图像二进制
         image: 上传的图像文件
         strength: 法线强度
+        output_format: 返回图像格式 (png, jpeg)
         
     Returns:
-        生成的法线贴图Base64字符串
+        生成的法线贴图Base64字符串，或图像二进制
     """
-    try:
-        logger.info(f"Received normal map generation request for image: {image.filename}")
-        
-        # 确保法线贴图生成器已加载
-        global normal_generator
-        if normal_generator is None:
-            logger.info("Loading Normal Map Generator...")
-            from modules.normal_map import NormalMapGenerator
-            normal_generator = NormalMapGenerator(config)
-            logger.info("Normal Map Generator loaded successfully")
-        
-        # 读取图像文件
-        image_data = image.file.read()
-        image = Image.open(BytesIO(image_data))
-        
-        # 保存临时图像用于处理，使用唯一文件名避免冲突
-        temp_path = f"temp_normal_map_input_{id(image)}.png"
-        image.save(temp_path)
-        
-        # 生成法线贴图
-        result = normal_generator.generate(temp_path, strength)
-        
-        # 删除临时文件
-        os.remove(temp_path)
-        
-        if result is None:
-            raise HTTPException(status_code=500, detail="Normal map generation failed")
-        
-        # 转换为Base64
-        result_base64 = image_to_base64(result)
-        
-        logger.info(f"Normal map generated successfully for image: {image.filename}")
-        
-        return {
-            "success": True,
-            "image": result_base64
-        }
+    logger.info("Received normal map generation request for image: %s", image.filename)
+    image_data = await image.read()
+    
+    async def op():
+        # 获取法线贴图生成器（首次使用时加载）
+        normal_generator = await model_registry.get("normal")
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Normal map generation error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Normal map generation failed: {str(e)}")
+        # 生成法线贴图，上传的图像在工作线程中解码后直接交给生成器
+        return await anyio.to_thread.run_sync(
+            lambda: normal_generator.generate(upload_to_image(image_data), strength)
+        )
+    
+    cache_key = ("normal", content_hash(image_data), strength)
+    return await _run_op("Normal map generation", op, cache_key, request, output_format)
 
 @app.post("/inpaint")
-def inpaint_image(
+async def inpaint_image(
+    request: Request,
     image: UploadFile = File(...),
     mask: UploadFile = File(...),
     method: str = Query("telea", description="Inpainting method: telea, ns, or lama"),
     radius: int = Query(3, description="Inpainting radius (for OpenCV methods)"),
-    padding: int = Query(10, description="Mask padding in pixels")
+    padding: int = Query(10, description="Mask padding in pixels"),
+    output_format: OutputFormat = Query("png", description="Result image format: png (lossless) or jpeg")
 ):
     """
     执行图像修复（Inpainting）
     
     Args:
+        request: 请求对象，Accept 为 image/* 时直接返回图像二进制（参数见 X-* 响应头）
         image: 上传的原始图像文件
         mask: 上传的遮罩图像文件（白色区域将被修复）
         method: 修复方法 (telea, ns, lama)
         radius: 修复半径（仅用于 OpenCV 方法）
         padding: 遮罩扩展像素数
+        output_format: 返回图像格式 (png, jpeg)
         
     Returns:
-        修复后的图像Base64字符串
+        修复后的图像Base64字符串，或图像二进制
     """
-    try:
-        logger.info(f"Received inpainting request for image: {image.filename}, mask: {mask.filename}")
-        
-        # 确保 Inpainting 处理器已加载
-        global inpainting_processor
-        if inpainting_processor is None:
-            logger.info("Loading Inpainting Processor...")
-            from modules.inpainting import InpaintingProcessor
-            inpainting_processor = InpaintingProcessor(config, use_lama=False)
-            logger.info("Inpainting Processor loaded successfully")
-        
-        # 读取图像文件
-        image_data = image.file.read()
-        image_pil = Image.open(BytesIO(image_data))
-        
-        # 读取遮罩文件
-        mask_data = mask.file.read()
-        mask_pil = Image.open(BytesIO(mask_data))
-        
-        # 保存临时文件
-        temp_image_path = f"temp_inpaint_image_{id(image_pil)}.png"
-        temp_mask_path = f"temp_inpaint_mask_{id(mask_pil)}.png"
-        
-        image_pil.save(temp_image_path)
-        mask_pil.save(temp_mask_path)
-        
-        # 执行修复
-        result = inpainting_processor.inpaint(
-            temp_image_path, 
-            temp_mask_path, 
-            method=method,
-            radius=radius,
-            padding=padding
+    logger.info("Received inpainting request for image: %s, mask: %s", image.filename, mask.filename)
+    image_data = await image.read()
+    mask_data = await mask.read()
+    
+    async def op():
+        # 获取 Inpainting 处理器（首次使用时加载）
+        inpainting_processor = await model_registry.get("inpainting")
+        
+        # 在工作线程中直接解码为 ndarray
+        def decode():
+            return upload_to_ndarray(image_data), upload_to_ndarray(mask_data, cv2.IMREAD_GRAYSCALE)
+        image_np, mask_np = await anyio.to_thread.run_sync(decode)
+        
+        # 执行修复：LaMa 在当前进程推理，OpenCV 方法交给进程池
+        if method == "lama" and inpainting_processor.use_lama:
+            return await anyio.to_thread.run_sync(
+                inpainting_processor.inpaint_array, image_np, mask_np, method, radius, padding
+            )
+        pool = inpaint_pool
+        if pool is None:
+            # 未经过启动事件（没有进程池）时在线程中修复
+            result_bgr = await anyio.to_thread.run_sync(
+                lambda: inpainting_processor.inpaint_array(image_np, mask_np, method, radius, padding,
+                                                           return_format="ndarray")
+            )
+        else:
+            loop = asyncio.get_running_loop()
+            result_bgr = await loop.run_in_executor(
+                pool, inpaint_in_worker, image_np, mask_np, method, radius, padding
+            )
+        # 结果的颜色转换同样不在事件循环线程上执行
+        return await anyio.to_thread.run_sync(
+            lambda: Image.fromarray(cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB))
         )
-        
-        # 删除临时文件
-        os.remove(temp_image_path)
-        os.remove(temp_mask_path)
-        
-        if result is None:
-            raise HTTPException(status_code=500, detail="Inpainting failed")
-        
-        # 转换为Base64
-        result_base64 = image_to_base64(result)
-        
-        logger.info(f"Inpainting completed successfully using {method} method")
-        
-        return {
-            "success": True,
-            "image": result_base64,
-            "method": method,
-            "radius": radius,
-            "padding": padding
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Inpainting error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Inpainting failed: {str(e)}")
+    
+    cache_key = ("inpaint", content_hash(image_data), content_hash(mask_data), method, radius, padding)
+    params = {"method": method, "radius": radius, "padding": padding}
+    # 图像二进制响应中修复参数通过响应头返回
+    headers = {"X-Method": method, "X-Radius": str(radius), "X-Padding": str(padding)}
+    return await _run_op("Inpainting", op, cache_key, request, output_format, params, headers)
+
+# 可用修复方法是固定的，导入时构建一次，无需为此加载修复处理器
+INPAINT_METHODS_PAYLOAD = {
+    "success": True,
+    "methods": ["telea", "ns", "lama"] if INPAINT_USE_LAMA else ["telea", "ns"],
+    "descriptions": {
+        "telea": "Fast Marching Method (Telea) - Fast and good for small areas",
+        "ns": "Navier-Stokes Method - Better for larger areas but slower",
+        "lama": "LaMa Model - Best quality but requires GPU (if available)"
+    }
+}
 
 @app.get("/inpaint/methods")
-def get_inpainting_methods():
+async def get_inpainting_methods():
     """
     获取可用的 Inpainting 方法列表
     
     Returns:
         可用方法列表
     """
-    try:
-        # 确保 Inpainting 处理器已加载
-        global inpainting_processor
-        if inpainting_processor is None:
-            from modules.inpainting import InpaintingProcessor
-            inpainting_processor = InpaintingProcessor(config, use_lama=False)
-        
-        methods = inpainting_processor.get_available_methods()
-        
-        return {
-            "success": True,
-            "methods": methods,
-            "descriptions": {
-                "telea": "Fast Marching Method (Telea) - Fast and good for small areas",
-                "ns": "Navier-Stokes Method - Better for larger areas but slower",
-                "lama": "LaMa Model - Best quality but requires GPU (if available)"
-            }
-        }
-        
-    except Exception as e:
-        logger.error(f"Failed to get inpainting methods: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to get methods: {str(e)}")
+    return INPAINT_METHODS_PAYLOAD
 
 # 语义分割 API 端点
 @app.post("/semantic/edge-snap")
-def edge_snap(
+async def edge_snap(
     image: UploadFile = File(...),
     points: str = Query(...),
     labels: str = Query(...)
@@ -425,44 +767,36 @@ def edge_snap(
         吸附后的边缘点列表
     """
     try:
-        logger.info(f"Received edge snap request for image: {image.filename}")
+        logger.info("Received edge snap request for image: %s", image.filename)
         
-        # 确保语义分割模型已加载
-        global semantic_segmenter
-        if semantic_segmenter is None:
-            logger.info("Loading Semantic Segmentation model...")
-            semantic_segmenter = SemanticSegmentation(config)
-            logger.info("Semantic Segmentation model loaded successfully")
+        # 获取语义分割模型（首次使用时加载）
+        semantic_segmenter = await model_registry.get("semantic")
         
-        # 读取图像文件
-        image_data = image.file.read()
-        temp_path = f"temp_edge_snap_input_{id(image)}.png"
-        with open(temp_path, "wb") as f:
-            f.write(image_data)
+        # 读取图像文件，在工作线程中直接解码为灰度 ndarray
+        image_np = await anyio.to_thread.run_sync(upload_to_ndarray, await image.read(), cv2.IMREAD_GRAYSCALE)
         
         # 解析点坐标
-        points_list = []
-        for point in points.split(';'):
-            x, y = point.split(',')
-            points_list.append({'x': float(x), 'y': float(y)})
+        points_np = parse_numbers(points, 2)
         
         # 解析标签
         label = labels.split(';')[0] if labels else 'foreground'
         
         # 执行边缘吸附
-        result = semantic_segmenter.perform_edge_snap(temp_path, points_list, label)
-        
-        # 删除临时文件
-        os.remove(temp_path)
+        result = await anyio.to_thread.run_sync(
+            semantic_segmenter.perform_edge_snap_array, image_np, points_np, label
+        )
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Edge snap error: {str(e)}")
+        logger.error("Edge snap error: %s", e)
         raise HTTPException(status_code=500, detail=f"Edge snap failed: {str(e)}")
 
 @app.post("/semantic/joint-expansion")
-def joint_expansion(
+async def joint_expansion(
+    request: Request,
     image: UploadFile = File(...),
     bbox: str = Query(...),
     label: str = Query("foreground")
@@ -471,6 +805,7 @@ def joint_expansion(
     执行关节补全
     
     Args:
+        request: 请求对象，Accept 为 image/* 时直接返回遮罩 PNG 二进制
         image: 上传的图像文件
         bbox: 边界框，格式："x,y,width,height"
         label: 标签类型 ('foreground' or 'background')
@@ -479,23 +814,16 @@ def joint_expansion(
         补全后的遮罩图像
     """
     try:
-        logger.info(f"Received joint expansion request for image: {image.filename}")
+        logger.info("Received joint expansion request for image: %s", image.filename)
         
-        # 确保语义分割模型已加载
-        global semantic_segmenter
-        if semantic_segmenter is None:
-            logger.info("Loading Semantic Segmentation model...")
-            semantic_segmenter = SemanticSegmentation(config)
-            logger.info("Semantic Segmentation model loaded successfully")
+        # 获取语义分割模型（首次使用时加载）
+        semantic_segmenter = await model_registry.get("semantic")
         
-        # 读取图像文件
-        image_data = image.file.read()
-        temp_path = f"temp_joint_expansion_input_{id(image)}.png"
-        with open(temp_path, "wb") as f:
-            f.write(image_data)
+        # 读取图像文件，在工作线程中直接解码为 ndarray
+        image_np = await anyio.to_thread.run_sync(upload_to_ndarray, await image.read())
         
         # 解析边界框
-        x, y, width, height = map(float, bbox.split(','))
+        x, y, width, height = parse_numbers(bbox, 4)[0].tolist()
         bbox_dict = {
             'x': x,
             'y': y,
@@ -504,30 +832,27 @@ def joint_expansion(
         }
         
         # 执行关节补全
-        result = semantic_segmenter.perform_joint_expansion(temp_path, bbox_dict, label)
-        
-        # 删除临时文件
-        os.remove(temp_path)
+        result = await anyio.to_thread.run_sync(
+            semantic_segmenter.perform_joint_expansion_array, image_np, bbox_dict, label
+        )
         
-        if result['success'] and result.get('expandedMask'):
-            # 读取遮罩图像并转换为Base64
-            with open(result['expandedMask'], 'rb') as f:
-                mask_data = f.read()
-            mask_base64 = base64.b64encode(mask_data).decode('utf-8')
-            result['expandedMaskBase64'] = f"data:image/png;base64,{mask_base64}"
-            
-            # 删除临时遮罩文件
-            os.remove(result['expandedMask'])
-            del result['expandedMask']
+        if result['success'] and result.get('expandedMask') is not None:
+            # 遮罩以 ndarray 返回，直接编码，无需经过临时文件
+            expanded_mask = Image.fromarray(result.pop('expandedMask'))
+            if wants_image_response(request):
+                return await anyio.to_thread.run_sync(image_response, expanded_mask)
+            result['expandedMaskBase64'] = await anyio.to_thread.run_sync(image_to_base64, expanded_mask)
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Joint expansion error: {str(e)}")
+        logger.error("Joint expansion error: %s", e)
         raise HTTPException(status_code=500, detail=f"Joint expansion failed: {str(e)}")
 
 @app.post("/semantic/apply-preset")
-def apply_preset(
+async def apply_preset(
     image: UploadFile = File(...),
     preset_id: str = Query(...)
 ):
@@ -542,47 +867,32 @@ def apply_preset(
         生成的部位列表和遮罩
     """
     try:
-        logger.info(f"Received apply preset request for image: {image.filename}, preset: {preset_id}")
+        logger.info("Received apply preset request for image: %s, preset: %s", image.filename, preset_id)
         
-        # 确保语义分割模型已加载
-        global semantic_segmenter
-        if semantic_segmenter is None:
-            logger.info("Loading Semantic Segmentation model...")
-            semantic_segmenter = SemanticSegmentation(config)
-            logger.info("Semantic Segmentation model loaded successfully")
+        # 获取语义分割模型（首次使用时加载）
+        semantic_segmenter = await model_registry.get("semantic")
         
         # 读取图像文件
-        image_data = image.file.read()
-        temp_path = f"temp_apply_preset_input_{id(image)}.png"
-        with open(temp_path, "wb") as f:
-            f.write(image_data)
-        
-        # 应用部位预设
-        result = semantic_segmenter.apply_part_preset(temp_path, preset_id)
-        
-        # 删除临时文件
-        os.remove(temp_path)
-        
-        if result['success'] and result.get('parts'):
-            # 转换每个部位的遮罩为Base64
-            for part in result['parts']:
-                with open(part['mask'], 'rb') as f:
-                    mask_data = f.read()
-                mask_base64 = base64.b64encode(mask_data).decode('utf-8')
-                part['maskBase64'] = f"data:image/png;base64,{mask_base64}"
-                
-                # 删除临时遮罩文件
-                os.remove(part['mask'])
-                del part['mask']
+        image_data = await image.read()
         
-        return result
+        def run():
+            # 解码、应用部位预设并把遮罩编码为 Base64，全部在内存中完成
+            result = semantic_segmenter.apply_part_preset_array(upload_to_ndarray(image_data), preset_id)
+            if result['success'] and result.get('parts'):
+                for part in result['parts']:
+                    part['maskBase64'] = image_to_base64(Image.fromarray(part.pop('mask')))
+            return result
         
+        return await anyio.to_thread.run_sync(run)
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Apply preset error: {str(e)}")
+        logger.error("Apply preset error: %s", e)
         raise HTTPException(status_code=500, detail=f"Apply preset failed: {str(e)}")
 
 @app.post("/semantic/process-brush")
-def process_brush(
+async def process_brush(
     image: UploadFile = File(...),
     strokes: str = Query(...)
 ):
@@ -597,46 +907,31 @@ def process_brush(
         生成的语义遮罩
     """
     try:
-        logger.info(f"Received process brush request for image: {image.filename}")
+        logger.info("Received process brush request for image: %s", image.filename)
         
-        # 确保语义分割模型已加载
-        global semantic_segmenter
-        if semantic_segmenter is None:
-            logger.info("Loading Semantic Segmentation model...")
-            semantic_segmenter = SemanticSegmentation(config)
-            logger.info("Semantic Segmentation model loaded successfully")
+        # 获取语义分割模型（首次使用时加载）
+        semantic_segmenter = await model_registry.get("semantic")
         
         # 读取图像文件
-        image_data = image.file.read()
-        temp_path = f"temp_process_brush_input_{id(image)}.png"
-        with open(temp_path, "wb") as f:
-            f.write(image_data)
+        image_data = await image.read()
         
         # 解析笔触数据
         import json
         strokes_list = json.loads(strokes)
         
-        # 处理语义涂抹
-        result = semantic_segmenter.process_semantic_brush(temp_path, strokes_list)
-        
-        # 删除临时文件
-        os.remove(temp_path)
+        def run():
+            # 解码、处理语义涂抹并把遮罩编码为 Base64，全部在内存中完成
+            result = semantic_segmenter.process_semantic_brush_array(upload_to_ndarray(image_data), strokes_list)
+            if result['success'] and result.get('semanticMask') is not None:
+                result['semanticMaskBase64'] = image_to_base64(Image.fromarray(result.pop('semanticMask')))
+            return result
         
-        if result['success'] and result.get('semanticMask'):
-            # 读取遮罩图像并转换为Base64
-            with open(result['semanticMask'], 'rb') as f:
-                mask_data = f.read()
-            mask_base64 = base64.b64encode(mask_data).decode('utf-8')
-            result['semanticMaskBase64'] = f"data:image/png;base64,{mask_base64}"
-            
-            # 删除临时遮罩文件
-            os.remove(result['semanticMask'])
-            del result['semanticMask']
-        
-        return result
+        return await anyio.to_thread.run_sync(run)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Process brush error: {str(e)}")
+        logger.error("Process brush error: %s", e)
         raise HTTPException(status_code=500, detail=f"Process brush failed: {str(e)}")
 
 # 工作流相关API端点
@@ -649,13 +944,13 @@ def start_workflow():
         工作流启动状态
     """
     try:
-        workflow_manager.start_monitoring()
+        get_workflow_manager().start_monitoring()
         return {
             "success": True,
             "message": "Workflow monitoring started successfully"
         }
     except Exception as e:
-        logger.error(f"Failed to start workflow: {str(e)}")
+        logger.error("Failed to start workflow: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to start workflow: {str(e)}")
 
 @app.post("/workflow/stop")
@@ -667,13 +962,13 @@ def stop_workflow():
         工作流停止状态
     """
     try:
-        workflow_manager.stop_monitoring()
+        get_workflow_manager().stop_monitoring()
         return {
             "success": True,
             "message": "Workflow monitoring stopped successfully"
         }
     except Exception as e:
-        logger.error(f"Failed to stop workflow: {str(e)}")
+        logger.error("Failed to stop workflow: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to stop workflow: {str(e)}")
 
 @app.get("/workflow/status")
@@ -685,13 +980,13 @@ def get_workflow_status():
         工作流当前状态信息
     """
     try:
-        status = workflow_manager.get_workflow_status()
+        status = get_workflow_manager().get_workflow_status()
         return {
             "success": True,
             "status": status
         }
     except Exception as e:
-        logger.error(f"Failed to get workflow status: {str(e)}")
+        logger.error("Failed to get workflow status: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get workflow status: {str(e)}")
 
 @app.post("/workflow/process-file/{filename}")
@@ -706,13 +1001,13 @@ def process_file(filename: str):
         文件处理结果
     """
     try:
-        result = workflow_manager.process_file(filename)
+        result = get_workflow_manager().process_file(filename)
         return {
             "success": True,
             "result": result
         }
     except Exception as e:
-        logger.error(f"Failed to process file {filename}: {str(e)}")
+        logger.error("Failed to process file %s: %s", filename, e)
         raise HTTPException(status_code=500, detail=f"Failed to process file: {str(e)}")
 
 @app.post("/workflow/clear-history")
@@ -724,14 +1019,15 @@ def clear_workflow_history():
         历史清除状态
     """
     try:
-        workflow_manager.clear_processed_files()
-        workflow_manager.clear_failed_files()
+        manager = get_workflow_manager()
+        manager.clear_processed_files()
+        manager.clear_failed_files()
         return {
             "success": True,
             "message": "Workflow history cleared successfully"
         }
     except Exception as e:
-        logger.error(f"Failed to clear workflow history: {str(e)}")
+        logger.error("Failed to clear workflow history: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to clear workflow history: {str(e)}")
 
 @app.post("/workflow/generate-metadata")
@@ -743,7 +1039,7 @@ def generate_metadata():
         元数据生成状态
     """
     try:
-        result = workflow_manager.generate_metadata()
+        result = get_workflow_manager().generate_metadata()
         if result["success"]:
             return {
                 "success": True,
@@ -753,7 +1049,7 @@ def generate_metadata():
         else:
             raise HTTPException(status_code=500, detail=result["message"])
     except Exception as e:
-        logger.error(f"Failed to generate metadata: {str(e)}")
+        logger.error("Failed to generate metadata: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate metadata: {str(e)}")
 
 @app.get("/workflow/get-batch-config")
@@ -765,15 +1061,16 @@ def get_batch_config():
         当前批量配置信息
     """
     try:
+        manager = get_workflow_manager()
         return {
             "success": True,
             "config": {
-                "max_parallel_tasks": workflow_manager.max_parallel_tasks,
-                "current_running_tasks": workflow_manager.current_running_tasks
+                "max_parallel_tasks": manager.max_parallel_tasks,
+                "current_running_tasks": manager.current_running_tasks
             }
         }
     except Exception as e:
-        logger.error(f"Failed to get batch configuration: {str(e)}")
+        logger.error("Failed to get batch configuration: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get batch configuration: {str(e)}")
 
 @app.post("/workflow/set-batch-config")
@@ -788,7 +1085,7 @@ def set_batch_config(config: BatchConfigRequest):
         配置更新状态
     """
     try:
-        result = workflow_manager.set_batch_config(config.max_parallel_tasks)
+        result = get_workflow_manager().set_batch_config(config.max_parallel_tasks)
         if result["success"]:
             return {
                 "success": True,
@@ -798,7 +1095,7 @@ def set_batch_config(config: BatchConfigRequest):
         else:
             raise HTTPException(status_code=400, detail=result["message"])
     except Exception as e:
-        logger.error(f"Failed to set batch configuration: {str(e)}")
+        logger.error("Failed to set batch configuration: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to set batch configuration: {str(e)}")
 
 # 启动服务器
@@ -806,12 +1103,20 @@ if __name__ == "__main__":
     import uvicorn
     
     logger.info("Starting AmberPipeline AI backend server...")
-    logger.info(f"Server will be running at http://localhost:8000")
+    logger.info("Server will be running at http://localhost:8000")
     
+    # 单进程时直接传入 app 对象，避免 uvicorn 以 "server" 为名再次导入本模块；多进程时需要导入字符串
+    workers = int(os.getenv("WORKERS", "1"))
     uvicorn.run(
-        "server:app",
+        app if workers == 1 else "server:app",
         host="localhost",
         port=8000,
         reload=False,  # 生产环境中设置为False
-        log_level="info"
+        log_level="info",
+        # 安装了 uvloop/httptools (uvicorn[standard]) 时自动使用，Windows 上回退到 asyncio
+        loop="auto",
+        http="auto",
+        # 不记录每个请求的访问日志，减少日志 IO
+        access_log=False,
+        workers=workers
     )
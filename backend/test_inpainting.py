@@ -20,22 +20,33 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _paint_test_image(pixels):
+    """
+    在图像数组上绘制红色和绿色矩形
+    """
+    pixels[151:350, 201:400] = (255, 0, 0)  # 红色
+    pixels[251:450, 401:600] = (0, 255, 0)  # 绿色
+
+
+def _paint_circle_mask(mask_pixels, center_x, center_y, radius):
+    """
+    在遮罩数组上绘制白色圆形
+    """
+    ys, xs = np.ogrid[:mask_pixels.shape[0], :mask_pixels.shape[1]]
+    mask_pixels[(xs - center_x) ** 2 + (ys - center_y) ** 2 < radius ** 2] = 255
+
+
 def create_test_images():
     """
     创建测试图像和遮罩
     """
     # 创建测试图像（800x600，带有一些内容）
     width, height = 800, 600
-    image = Image.new('RGB', (width, height), color='white')
+    pixels = np.full((height, width, 3), 255, dtype=np.uint8)
     
     # 添加一些彩色矩形
-    pixels = image.load()
-    for y in range(height):
-        for x in range(width):
-            if 200 < x < 400 and 150 < y < 350:
-                pixels[x, y] = (255, 0, 0)  # 红色
-            elif 400 < x < 600 and 250 < y < 450:
-                pixels[x, y] = (0, 255, 0)  # 绿色
+    _paint_test_image(pixels)
+    image = Image.fromarray(pixels, 'RGB')
     
     # 保存测试图像
     test_image_path = 'test_image.png'
@@ -43,16 +54,13 @@ def create_test_images():
     logger.info(f"Created test image: {test_image_path}")
     
     # 创建遮罩（白色区域将被修复）
-    mask = Image.new('L', (width, height), color=0)
-    mask_pixels = mask.load()
+    mask_pixels = np.zeros((height, width), dtype=np.uint8)
     
     # 在中心创建一个圆形遮罩
     center_x, center_y = width // 2, height // 2
     radius = 100
-    for y in range(height):
-        for x in range(width):
-            if (x - center_x) ** 2 + (y - center_y) ** 2 < radius ** 2:
-                mask_pixels[x, y] = 255
+    _paint_circle_mask(mask_pixels, center_x, center_y, radius)
+    mask = Image.fromarray(mask_pixels, 'L')
     
     # 保存遮罩
     test_mask_path = 'test_mask.png'
@@ -69,7 +77,7 @@ def test_inpainting():
     logger.info("Starting Inpainting test...")
     
     # 创建配置
-    config = Config()
+    config = Config.get()
     
     # 创建测试图像
     image_path, mask_path = create_test_images()
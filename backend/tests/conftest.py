@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+pytest 配置：与直接运行 backend/server.py 时相同的导入路径
+（backend 目录优先，项目根目录在后，modules 命名空间包同时包含两处的模块）
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+
+if BACKEND_DIR in sys.path:
+    sys.path.remove(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
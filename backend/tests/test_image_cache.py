@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试解码缓存的失效和字节预算淘汰
+"""
+
+import os
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from modules.image_cache import ByteBudgetCache, DecodeCache
+from modules.inpainting import InpaintingProcessor
+
+
+def _write(path, value, mtime):
+    """
+    写入纯色灰度图并设置修改时间
+    """
+    cv2.imwrite(str(path), np.full((8, 8), value, dtype=np.uint8))
+    os.utime(path, (mtime, mtime))
+
+
+def test_decode_cache_hits_while_file_is_unchanged(tmp_path):
+    cache = DecodeCache()
+    path = tmp_path / "image.png"
+    _write(path, 10, 1_000_000)
+
+    first = cache.load(str(path), cv2.IMREAD_GRAYSCALE)
+    second = cache.load(str(path), cv2.IMREAD_GRAYSCALE)
+
+    assert first is second
+    assert not first.flags.writeable
+
+
+def test_decode_cache_reloads_after_mtime_change(tmp_path):
+    cache = DecodeCache()
+    path = tmp_path / "image.png"
+    _write(path, 10, 1_000_000)
+    first = cache.load(str(path), cv2.IMREAD_GRAYSCALE)
+
+    _write(path, 200, 1_000_100)
+    second = cache.load(str(path), cv2.IMREAD_GRAYSCALE)
+
+    assert second is not first
+    assert int(second[0, 0]) == 200
+
+
+def test_decode_cache_keys_on_read_flags(tmp_path):
+    cache = DecodeCache()
+    path = tmp_path / "image.png"
+    _write(path, 10, 1_000_000)
+
+    gray = cache.load(str(path), cv2.IMREAD_GRAYSCALE)
+    color = cache.load(str(path), cv2.IMREAD_COLOR)
+
+    assert gray.ndim == 2 and color.ndim == 3
+
+
+def test_decode_cache_missing_file_returns_none(tmp_path):
+    assert DecodeCache().load(str(tmp_path / "missing.png")) is None
+
+
+def test_prepared_mask_is_rebuilt_after_mtime_change(tmp_path):
+    """
+    修复模块的处理后遮罩缓存同样随修改时间失效
+    """
+    processor = InpaintingProcessor(SimpleNamespace())
+    path = tmp_path / "mask.png"
+    _write(path, 0, 1_000_000)
+    first = processor._prepare_mask(str(path), (8, 8), 0)
+
+    _write(path, 255, 1_000_100)
+    second = processor._prepare_mask(str(path), (8, 8), 0)
+
+    assert cv2.countNonZero(first) == 0
+    assert cv2.countNonZero(second) == 64
+
+
+def test_byte_budget_cache_evicts_least_recently_used():
+    cache = ByteBudgetCache(budget_bytes=300, getsizeof=len)
+    cache.put("a", b"x" * 100)
+    cache.put("b", b"x" * 100)
+    cache.put("c", b"x" * 100)
+    # 访问 a 后，b 成为最久未使用的条目
+    assert cache.get("a") is not None
+    cache.put("d", b"x" * 100)
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "c", "d"))
+
+
+def test_byte_budget_cache_skips_oversized_values_and_shrinks():
+    cache = ByteBudgetCache(budget_bytes=100, getsizeof=len)
+    cache.put("big", b"x" * 101)
+    assert cache.get("big") is None
+
+    cache.put("a", b"x" * 60)
+    cache.put("b", b"x" * 40)
+    cache.set_budget(50)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+测试修复进程池工作进程的初始化（日志转发）
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+from modules.inpainting import init_worker, inpaint_in_worker
+
+
+def _root_handlers():
+    """
+    在工作进程中返回根日志器的处理器类型和级别
+    """
+    root = logging.getLogger()
+    return [type(handler).__name__ for handler in root.handlers], root.level
+
+
+def _drain(log_queue, timeout=5):
+    records = []
+    while True:
+        try:
+            records.append(log_queue.get(timeout=timeout))
+        except queue.Empty:
+            return records
+        timeout = 0.2
+
+
+def test_worker_logs_are_sent_to_parent_queue():
+    """
+    工作进程只保留指向父进程队列的处理器，修复过程中的日志都发回父进程
+    """
+    image = np.full((64, 64, 3), 128, dtype=np.uint8)
+    mask = np.zeros((64, 64), dtype=np.uint8)
+    mask[20:30, 20:30] = 255
+    log_queue = multiprocessing.Queue()
+    # 模拟服务进程根日志器上的 QueueHandler（子进程中没有消费者）
+    stale_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    logging.getLogger().addHandler(stale_handler)
+    try:
+        with ProcessPoolExecutor(max_workers=1, initializer=init_worker,
+                                 initargs=(SimpleNamespace(), log_queue, logging.INFO)) as pool:
+            handlers, level = pool.submit(_root_handlers).result()
+            result = pool.submit(inpaint_in_worker, image, mask, "telea", 3, 0).result()
+    finally:
+        logging.getLogger().removeHandler(stale_handler)
+
+    assert handlers == ["QueueHandler"]
+    assert level == logging.INFO
+    assert result.shape == image.shape
+    messages = [record.getMessage() for record in _drain(log_queue)]
+    assert "Inpainting completed using telea method" in messages
+    log_queue.close()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试 OpenCV 修复的分块处理和整图回退
+"""
+
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from modules import inpainting
+from modules.inpainting import InpaintingProcessor, MAX_INPAINT_TILES
+
+
+@pytest.fixture
+def processor():
+    return InpaintingProcessor(SimpleNamespace())
+
+
+@pytest.fixture
+def inpaint_calls(monkeypatch):
+    """
+    记录每次 cv2.inpaint 调用的输入尺寸
+    """
+    calls = []
+    original = cv2.inpaint
+
+    def recording_inpaint(image, mask, radius, flags):
+        calls.append(image.shape[:2])
+        return original(image, mask, radius, flags)
+
+    monkeypatch.setattr(inpainting.cv2, "inpaint", recording_inpaint)
+    return calls
+
+
+def _test_image(height=300, width=400):
+    """
+    生成带渐变和噪声的测试图像
+    """
+    rng = np.random.default_rng(0)
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    image[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    image[..., 2] = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    return image
+
+
+def test_small_regions_are_inpainted_per_tile(processor, inpaint_calls):
+    """
+    分散的小遮罩按连通域分块修复，块外像素保持不变
+    """
+    image = _test_image()
+    mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    mask[40:50, 40:50] = 255
+    mask[200:212, 300:315] = 255
+
+    result = processor._inpaint_opencv(image, mask, 3, cv2.INPAINT_TELEA)
+
+    assert len(inpaint_calls) == 2
+    assert all(h < image.shape[0] and w < image.shape[1] for h, w in inpaint_calls)
+    # 第一块的范围为 [24, 66)，之外的像素不变
+    assert np.array_equal(result[100:180, 100:250], image[100:180, 100:250])
+    assert not np.array_equal(result[40:50, 40:50], image[40:50, 40:50])
+    assert not np.array_equal(result[200:212, 300:315], image[200:212, 300:315])
+
+
+def test_tiles_match_full_image_inpaint_inside_mask(processor):
+    """
+    块内保留的上下文足够时，分块结果与整图修复一致
+    """
+    image = _test_image()
+    mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    mask[120:130, 150:165] = 255
+
+    tiled = processor._inpaint_opencv(image, mask, 3, cv2.INPAINT_TELEA)
+    full = cv2.inpaint(image, mask, 3, cv2.INPAINT_TELEA)
+
+    assert np.array_equal(tiled, full)
+
+
+def test_large_tiles_fall_back_to_full_image(processor, inpaint_calls):
+    """
+    分块面积之和超过图像面积一半时改为整图修复
+    """
+    image = _test_image()
+    mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    mask[50:250, 60:340] = 255
+
+    result = processor._inpaint_opencv(image, mask, 3, cv2.INPAINT_TELEA)
+
+    assert inpaint_calls == [image.shape[:2]]
+    assert np.array_equal(result, cv2.inpaint(image, mask, 3, cv2.INPAINT_TELEA))
+
+
+def test_many_fragments_merge_into_one_tile(processor, inpaint_calls):
+    """
+    连通域数量超过上限时合并为一个外接矩形
+    """
+    image = _test_image()
+    mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    # 互不相连的单像素点，集中在左上角
+    mask[20:60:3, 20:100:3] = 255
+    assert cv2.connectedComponents(mask)[0] - 1 > MAX_INPAINT_TILES
+
+    processor._inpaint_opencv(image, mask, 3, cv2.INPAINT_TELEA)
+
+    assert len(inpaint_calls) == 1
+    height, width = inpaint_calls[0]
+    assert height < image.shape[0] and width < image.shape[1]
+
+
+def test_empty_and_full_masks_skip_inpainting(processor, inpaint_calls):
+    """
+    空遮罩和几乎覆盖整图的遮罩直接返回原图副本
+    """
+    image = _test_image()
+    empty = np.zeros(image.shape[:2], dtype=np.uint8)
+    full = np.full(image.shape[:2], 255, dtype=np.uint8)
+
+    for mask in (empty, full):
+        result = processor.inpaint_array(image, mask, padding=0, return_format="ndarray")
+        assert np.array_equal(result, image)
+        assert result is not image
+    assert inpaint_calls == []
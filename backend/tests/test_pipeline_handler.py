@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试监控流水线（项目根目录 main.py）的文件分发和 C++ 头文件防抖
+"""
+
+import importlib
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("watchdog")
+
+from config import Config
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    """
+    在临时目录中导入 main，导入时创建的日志文件不会写到项目目录
+    """
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("pipeline"))
+    try:
+        return importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def handler(main, tmp_path, monkeypatch):
+    """
+    在临时目录中创建事件处理器（配置中的相对路径基于当前目录），图像处理替换为只登记资源
+    """
+    monkeypatch.chdir(tmp_path)
+    handler = main.ImageProcessingHandler(Config(str(tmp_path / "config.json")))
+    handler.processed = []
+    handler.header_writes = []
+
+    def process_image(file_path):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        handler.processed.append(name)
+        # 与 _process_image 第 11 步相同的登记方式
+        with handler._asset_lock:
+            if name not in handler._asset_names:
+                handler._asset_names.add(name)
+                handler.asset_list.append(name)
+                handler._schedule_header_rebuild()
+
+    generate_cpp_header = handler.code_sync.generate_cpp_header
+
+    def record_header(assets):
+        handler.header_writes.append(list(assets))
+        return generate_cpp_header(assets)
+
+    handler._process_image = process_image
+    handler.code_sync.generate_cpp_header = record_header
+    yield handler
+    if handler._worker.is_alive():
+        handler.close()
+
+
+def _header_text(handler):
+    with open(os.path.join(handler.config.cpp_header_dir, "AssetIDs.h"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_close_flushes_pending_header(handler):
+    """
+    close() 在防抖计时器触发之前写出待更新的头文件
+    """
+    handler._process_image("/watch/Tree_01.png")
+    handler.close()
+
+    assert handler.header_writes == [["Tree_01"]]
+    assert "ID_TREE_01" in _header_text(handler)
+    assert handler._header_timer is None
+
+
+def test_header_rebuild_coalesces_burst(main, handler):
+    """
+    连续加入的资源只触发一次头文件重建
+    """
+    for i in range(5):
+        handler._process_image(f"/watch/Rock_{i:02d}.png")
+    time.sleep(main.HEADER_REBUILD_DELAY * 4)
+
+    assert handler.header_writes == [[f"Rock_{i:02d}" for i in range(5)]]
+    handler.close()
+    assert len(handler.header_writes) == 1
+
+
+def test_close_submits_files_still_in_debounce(handler):
+    """
+    close() 处理仍在防抖等待中的文件，并在关闭线程池前停止分发线程
+    """
+    handler._schedule("/watch/Crate_A.png")
+    handler._schedule("/watch/Crate_B.png")
+    handler.close()
+
+    assert sorted(handler.processed) == ["Crate_A", "Crate_B"]
+    assert not handler._worker.is_alive()
+    assert [sorted(assets) for assets in handler.header_writes] == [["Crate_A", "Crate_B"]]
+
+
+def test_files_scheduled_after_close_are_ignored(handler):
+    handler.close()
+    handler._schedule("/watch/Late.png")
+
+    assert handler._pending == {}
+    assert handler.processed == []
+
+
+def test_debounced_file_is_dispatched_once(main, handler):
+    """
+    同一文件的多次事件合并为一次处理
+    """
+    done = threading.Event()
+    process_image = handler._process_image
+    handler._process_image = lambda path: (process_image(path), done.set())
+
+    for _ in range(3):
+        handler._schedule("/watch/Barrel.png")
+    assert done.wait(main.DEBOUNCE_SECONDS * 10)
+    handler.close()
+
+    assert handler.processed == ["Barrel"]
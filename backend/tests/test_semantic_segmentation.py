@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试语义分割的边缘吸附
+"""
+
+import numpy as np
+import pytest
+
+from modules import semantic_segmentation
+from modules.semantic_segmentation import SemanticSegmentation, SNAP_DISTANCE_TRANSFORM_MIN_POINTS
+
+
+def _random_edges(seed, shape=(120, 160), density=0.002):
+    """
+    生成稀疏的随机边缘图
+    """
+    rng = np.random.default_rng(seed)
+    return np.where(rng.random(shape) < density, 255, 0).astype(np.uint8)
+
+
+def _assert_same_snap(edges, point, fast, slow, radius):
+    """
+    两种方式的结果必须一致；多个边缘点距离相同时允许选择不同的点，但距离必须相同
+    """
+    if fast == slow:
+        return
+    x, y = point
+    for ex, ey in (fast, slow):
+        assert edges[ey, ex] != 0
+        assert max(abs(ex - x), abs(ey - y)) <= radius
+    assert (fast[0] - x) ** 2 + (fast[1] - y) ** 2 == (slow[0] - x) ** 2 + (slow[1] - y) ** 2
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("radius", [3, 10, 25])
+def test_distance_transform_snap_matches_window_scan(seed, radius):
+    """
+    距离变换（点数较多时）与逐点窗口扫描（点数较少时）的吸附结果一致
+    """
+    segmenter = SemanticSegmentation()
+    edges = _random_edges(seed)
+    rng = np.random.default_rng(100 + seed)
+    height, width = edges.shape
+    coords = [(int(x), int(y)) for x, y in zip(rng.integers(0, width, 400), rng.integers(0, height, 400))]
+    # 图像外的点走逐点扫描
+    coords += [(-5, 10), (width + 3, height // 2)]
+    
+    fast = segmenter._snap_points_distance_transform(edges, coords, radius)
+    slow = [segmenter._snap_point(edges, x, y, radius) for x, y in coords]
+    
+    for point, f, s in zip(coords, fast, slow):
+        _assert_same_snap(edges, point, f, s, radius)
+
+
+def test_snap_nearest_edge_outside_window_uses_window_edge():
+    """
+    全图最近的边缘点在方形窗口外时，两种方式都吸附到窗口内（对角方向）的边缘点
+    """
+    segmenter = SemanticSegmentation()
+    edges = np.zeros((40, 40), dtype=np.uint8)
+    x, y, radius = 20, 20, 5
+    edges[y, x + radius + 1] = 255  # 欧氏距离 6，位于窗口外
+    edges[y + radius, x + radius] = 255  # 欧氏距离约 7.07，位于窗口角上
+    
+    fast = segmenter._snap_points_distance_transform(edges, [(x, y)], radius)
+    slow = segmenter._snap_point(edges, x, y, radius)
+    
+    assert fast == [slow] == [(x + radius, y + radius)]
+
+
+def test_edge_snap_result_independent_of_point_count():
+    """
+    同一个点的吸附结果不因请求中的点数（是否超过距离变换阈值）而改变
+    """
+    segmenter = SemanticSegmentation()
+    gray = np.zeros((200, 200), dtype=np.uint8)
+    gray[:, 120:] = 255
+    gray[150:, :] = 128
+    rng = np.random.default_rng(7)
+    points = rng.integers(0, 200, (SNAP_DISTANCE_TRANSFORM_MIN_POINTS * 3, 2))
+    
+    batch = segmenter.perform_edge_snap_array(gray, points, 'foreground')
+    assert batch['success']
+    for point, snapped in zip(points, batch['snappedPoints']):
+        single = segmenter.perform_edge_snap_array(gray, point.reshape(1, 2), 'foreground')
+        assert single['snappedPoints'][0] == snapped
+
+
+@pytest.mark.parametrize("point", [(-4, 10), (10, -4), (-20, -20)])
+def test_snap_window_outside_image_keeps_point(point):
+    """
+    搜索窗口完全在图像外时保持原始点，不会吸附到图像另一侧的边缘
+    """
+    segmenter = SemanticSegmentation()
+    edges = np.full((30, 30), 255, dtype=np.uint8)
+    
+    assert segmenter._snap_point(edges, point[0], point[1], 2) == point
+def _window_points(edges, seed, count=200):
+    """
+    生成测试点，包括边界附近和图像外的点
+    """
+    rng = np.random.default_rng(seed)
+    height, width = edges.shape
+    coords = [(int(x), int(y)) for x, y in zip(rng.integers(0, width, count), rng.integers(0, height, count))]
+    return coords + [(0, 0), (width - 1, height - 1), (-3, 5), (width + 2, height // 2)]
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("radius", [1, 6, 20])
+def test_edge_scan_matches_numpy_window(seed, radius, monkeypatch):
+    """
+    标量扫描（Numba 编译前的原函数）与 NumPy 窗口查找的结果一致，包括距离相同时的取舍
+    """
+    monkeypatch.setattr(semantic_segmentation, "_edge_scan_kernel", lambda: None)
+    segmenter = SemanticSegmentation()
+    edges = _random_edges(seed, density=0.01)
+    
+    for x, y in _window_points(edges, seed):
+        best_x, best_y, _ = semantic_segmentation._closest_edge_scan(edges, x, y, radius)
+        assert (best_x, best_y) == segmenter._snap_point(edges, x, y, radius)
+
+
+def test_compiled_edge_scan_matches_python_scan():
+    """
+    安装了 Numba 时，编译版本与原函数结果一致
+    """
+    pytest.importorskip("numba")
+    assert semantic_segmentation.warm_up_edge_scan()
+    scan = semantic_segmentation._edge_scan_kernel()
+    edges = _random_edges(11, density=0.01)
+    
+    for x, y in _window_points(edges, 11):
+        assert scan(edges, x, y, 6) == semantic_segmentation._closest_edge_scan(edges, x, y, 6)
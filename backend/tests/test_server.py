@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试 FastAPI 服务端点的参数处理
+"""
+
+import importlib
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """
+    在临时目录中导入服务模块，导入时创建的日志文件和配置目录不会写到项目目录
+    """
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+    try:
+        yield importlib.import_module("server")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(server):
+    with TestClient(server.app) as client:
+        yield client
+
+
+def _png(array):
+    return cv2.imencode(".png", array)[1].tobytes()
+
+
+def _inpaint_files():
+    image = np.full((48, 48, 3), 128, dtype=np.uint8)
+    image[:, :24] = (40, 90, 200)
+    mask = np.zeros((48, 48), dtype=np.uint8)
+    mask[20:28, 20:28] = 255
+    return {"image": ("image.png", _png(image)), "mask": ("mask.png", _png(mask))}
+
+
+def test_inpaint_returns_png_by_default(client):
+    response = client.post("/inpaint", files=_inpaint_files())
+
+    assert response.status_code == 200
+    assert response.json()["image"].startswith("data:image/png;base64,")
+
+
+def test_inpaint_returns_jpeg_when_requested(client):
+    response = client.post("/inpaint", params={"output_format": "jpeg"}, files=_inpaint_files())
+
+    assert response.status_code == 200
+    assert response.json()["image"].startswith("data:image/jpeg;base64,")
+
+
+def test_unknown_output_format_is_rejected(client):
+    response = client.post("/inpaint", params={"output_format": "bmp"}, files=_inpaint_files())
+
+    assert response.status_code == 422
+
+
+def test_lifespan_creates_and_releases_services(server):
+    """
+    每次启动创建进程池和日志监听，关闭时释放；重复启动不会再开监听线程
+    """
+    for _ in range(2):
+        with TestClient(server.app) as client:
+            assert server.inpaint_pool is not None
+            assert server.log_listener_running
+            assert client.post("/inpaint", files=_inpaint_files()).status_code == 200
+        assert server.inpaint_pool is None
+        assert server.worker_log_listener is None
+        assert not server.log_listener_running
+
+
+def test_endpoints_work_without_lifespan(server, monkeypatch):
+    """
+    未触发启动事件时，修复在线程中执行，工作流管理器在首次使用时创建
+    """
+    monkeypatch.setattr(server, "inpaint_pool", None)
+    monkeypatch.setattr(server, "workflow_manager", None)
+    client = TestClient(server.app)
+
+    response = client.post("/inpaint", params={"padding": 3}, files=_inpaint_files())
+    assert response.status_code == 200
+    assert response.json()["image"].startswith("data:image/png;base64,")
+
+    response = client.get("/workflow/status")
+    assert response.status_code == 200
+    assert response.json()["status"]["is_running"] is False
+
+
+def test_parse_numbers_reshapes_rows(server):
+    values = server.parse_numbers("10,20;30,40", 2, np.int32)
+
+    assert values.dtype == np.int32
+    assert values.tolist() == [[10, 20], [30, 40]]
+
+
+@pytest.mark.parametrize("text", ["10,20,abc", "", "10,,20", "1.5,2"])
+def test_parse_numbers_rejects_malformed_input(server, text):
+    with pytest.raises(server.HTTPException) as excinfo:
+        server.parse_numbers(text, 1, np.int32)
+    assert excinfo.value.status_code == 400
+
+
+def test_parse_numbers_rejects_incomplete_rows(server):
+    with pytest.raises(server.HTTPException) as excinfo:
+        server.parse_numbers("10,20;30", 2)
+    assert excinfo.value.status_code == 400
+
+
+def test_edge_snap_rejects_malformed_points(client):
+    image = np.zeros((32, 32, 3), dtype=np.uint8)
+    response = client.post("/semantic/edge-snap", params={"points": "10,20,abc", "labels": "1"},
+                           files={"image": ("image.png", _png(image))})
+
+    assert response.status_code == 400
@@ -6,11 +6,23 @@ Manages pipeline parameters, including directory paths, AI model paths, image pr
 
 import os
 import json
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 
-@dataclass
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+@dataclass(init=False, slots=True, frozen=True)
 class Config:
-    """Pipeline configuration class"""
+    """
+    Pipeline configuration class
+    
+    Instances are memoized per absolute config file path, so the file is parsed
+    and the working directories are created only once per process. They are
+    frozen, so the shared instance can be read from any thread without locks.
+    """
     # Directory configuration
     watch_dir: str  # Watch directory, where AI images to be processed are placed
     output_dir: str  # Output directory, where processed images are saved
@@ -29,7 +41,71 @@ class Config:
     normal_strength: float  # Normal strength
     normal_blur: float  # Normal map blur amount
     
-    def __init__(self, config_file: str = "config.json"):
+    # Pipeline configuration
+    cpp_header_dir: str  # Generated C++ header directory
+    batch_mode: bool  # Batch processing mode
+    max_parallel_tasks: int  # Maximum parallel processing tasks
+    image_cache_mb: int  # Decoded image cache budget (MB)
+    persist_processed_index: bool  # Remember processed files across restarts and skip them while unchanged
+    
+    # Working directory structure
+    raw_dir: str
+    sorted_dir: str
+    processed_dir: str
+    compiled_dir: str
+    
+    # Absolute path of the loaded config file
+    _config_file: str = field(repr=False, compare=False)
+    
+    # Loaded instances keyed by absolute config file path
+    _instances = {}
+    _instances_lock = threading.Lock()
+    
+    # Directories already created in this process
+    _ensured_dirs = set()
+    _ensured_lock = threading.Lock()
+    
+    def __new__(cls, config_file: str = "config.json"):
+        """
+        Return the shared configuration for config_file, loading it on first use
+        
+        Args:
+            config_file: Configuration file path
+        """
+        key = os.path.abspath(config_file)
+        instance = cls._instances.get(key)
+        if instance is not None:
+            return instance
+        
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                # object.__new__ directly: zero-argument super() doesn't work in slots dataclasses
+                instance = object.__new__(cls)
+                instance._load(key)
+                cls._instances[key] = instance
+        return instance
+    
+    @classmethod
+    def get(cls, config_file: str = "config.json") -> "Config":
+        """
+        Get the shared configuration for config_file
+        
+        Args:
+            config_file: Configuration file path
+        
+        Returns:
+            Config instance
+        """
+        return cls(config_file)
+    
+    def __reduce__(self):
+        """
+        Pickle by config file path, so worker processes load the shared instance for it
+        """
+        return (type(self), (self._config_file,))
+    
+    def _load(self, config_file: str):
         """
         Load configuration from config file, use default values if file doesn't exist
         
@@ -54,48 +130,109 @@ class Config:
             "normal_strength": 1.0,
             "normal_blur": 0.5,
             "batch_mode": False,
-            "max_parallel_tasks": 4
+            "max_parallel_tasks": 4,
+            "image_cache_mb": 512,       # Decoded image cache budget (MB)
+            "persist_processed_index": False  # Skip files already processed by a previous run
         }
         
         # Read configuration file
-        if os.path.exists(config_file):
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
+        config_data = self._read_config_file(config_file)
+        if config_data is not None:
             # Merge default configuration and file configuration
             default_config.update(config_data)
         else:
             # Create default configuration file
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=4, ensure_ascii=False)
+            self._write_default_config(config_file, default_config)
         
-        # Initialize configuration
-        self.watch_dir = os.path.abspath(default_config["watch_dir"])
-        self.output_dir = os.path.abspath(default_config["output_dir"])
-        self.models_dir = os.path.abspath(default_config["models_dir"])
-        self.temp_dir = os.path.abspath(default_config["temp_dir"])
-        self.target_size = tuple(default_config["target_size"])
-        self.sam_model_path = os.path.abspath(default_config["sam_model_path"])
-        self.sam_device = default_config["sam_device"]
-        self.sam_confidence_threshold = default_config["sam_confidence_threshold"]
-        self.normal_strength = default_config["normal_strength"]
-        self.normal_blur = default_config["normal_blur"]
-        self.cpp_header_dir = os.path.abspath(default_config["cpp_header_dir"])
-        self.batch_mode = default_config["batch_mode"]
-        self.max_parallel_tasks = default_config["max_parallel_tasks"]
+        # Resolve relative paths against the working directory, read once
+        cwd = os.getcwd()
+        def abspath(path: str) -> str:
+            return os.path.normpath(path if os.path.isabs(path) else os.path.join(cwd, path))
         
-        # Working directory structure
-        self.raw_dir = os.path.abspath(default_config["raw_dir"])
-        self.sorted_dir = os.path.abspath(default_config["sorted_dir"])
-        self.processed_dir = os.path.abspath(default_config["processed_dir"])
-        self.compiled_dir = os.path.abspath(default_config["compiled_dir"])
+        # Initialize configuration (frozen instance, so fields are set through object.__setattr__)
+        values = {
+            "watch_dir": abspath(default_config["watch_dir"]),
+            "output_dir": abspath(default_config["output_dir"]),
+            "models_dir": abspath(default_config["models_dir"]),
+            "temp_dir": abspath(default_config["temp_dir"]),
+            "target_size": tuple(default_config["target_size"]),
+            "sam_model_path": abspath(default_config["sam_model_path"]),
+            "sam_device": default_config["sam_device"],
+            "sam_confidence_threshold": default_config["sam_confidence_threshold"],
+            "normal_strength": default_config["normal_strength"],
+            "normal_blur": default_config["normal_blur"],
+            "cpp_header_dir": abspath(default_config["cpp_header_dir"]),
+            "batch_mode": default_config["batch_mode"],
+            "max_parallel_tasks": default_config["max_parallel_tasks"],
+            "image_cache_mb": default_config["image_cache_mb"],
+            "persist_processed_index": default_config["persist_processed_index"],
+            
+            # Working directory structure
+            "raw_dir": abspath(default_config["raw_dir"]),
+            "sorted_dir": abspath(default_config["sorted_dir"]),
+            "processed_dir": abspath(default_config["processed_dir"]),
+            "compiled_dir": abspath(default_config["compiled_dir"]),
+            
+            "_config_file": os.path.abspath(config_file),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
         
         # Create necessary directories
-        os.makedirs(self.watch_dir, exist_ok=True)
-        os.makedirs(self.output_dir, exist_ok=True)
-        os.makedirs(self.models_dir, exist_ok=True)
-        os.makedirs(self.temp_dir, exist_ok=True)
-        os.makedirs(self.cpp_header_dir, exist_ok=True)
-        os.makedirs(self.raw_dir, exist_ok=True)
-        os.makedirs(self.sorted_dir, exist_ok=True)
-        os.makedirs(self.processed_dir, exist_ok=True)
-        os.makedirs(self.compiled_dir, exist_ok=True)
+        self._ensure_dirs([
+            self.watch_dir,
+            self.output_dir,
+            self.models_dir,
+            self.temp_dir,
+            self.cpp_header_dir,
+            self.raw_dir,
+            self.sorted_dir,
+            self.processed_dir,
+            self.compiled_dir,
+        ])
+    
+    @staticmethod
+    def _read_config_file(config_file: str):
+        """
+        Read and parse the configuration file
+        
+        Args:
+            config_file: Configuration file path
+        
+        Returns:
+            Parsed configuration dict, or None if the file doesn't exist
+        """
+        try:
+            if orjson is not None:
+                with open(config_file, 'rb') as f:
+                    return orjson.loads(f.read())
+            with open(config_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    @staticmethod
+    def _write_default_config(config_file: str, default_config: dict):
+        """
+        Create the default configuration file (first run only)
+        
+        Args:
+            config_file: Configuration file path
+            default_config: Default configuration
+        """
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(default_config, f, indent=4, ensure_ascii=False)
+    
+    @classmethod
+    def _ensure_dirs(cls, dirs: list):
+        """
+        Create directories, skipping duplicates and ones already created in this process
+        
+        Args:
+            dirs: Absolute directory paths
+        """
+        with cls._ensured_lock:
+            pending = [d for d in dict.fromkeys(dirs) if d not in cls._ensured_dirs]
+            for d in pending:
+                os.makedirs(d, exist_ok=True)
+            cls._ensured_dirs.update(pending)
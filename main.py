@@ -7,13 +7,16 @@ Features: Directory monitoring -> Automatic image matting -> Normal map generati
 
 import os
 import time
+import signal
+import threading
 import logging
-from watchdog.observers import Observer
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
 from watchdog.events import FileSystemEventHandler
 from config import Config
-from modules.segmentation import SAMSegmenter  # SAM2 segmentation module
-from modules.normal_map import NormalMapGenerator
-from modules.image_processing import ImageProcessor
+# SAM2 (torch) and the other processors are imported in _init_processors, on the first image
+from modules.image_processing import is_supported_image
 from modules.naming_resolver import NamingResolver
 from modules.code_sync import CodeSync
 
@@ -28,6 +31,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Quiet period after the last event for a file before it is considered completely written
+DEBOUNCE_SECONDS = 0.5
+# Size-stability probe run by the worker before reading a file
+STABLE_POLL_SECONDS = 0.05
+STABLE_MAX_WAIT_SECONDS = 30
+# The C++ header is rebuilt once no asset has been added for HEADER_REBUILD_DELAY seconds,
+# but never later than HEADER_REBUILD_MAX_DELAY after the first pending asset during a long import
+HEADER_REBUILD_DELAY = 0.25
+HEADER_REBUILD_MAX_DELAY = 5.0
+
+@dataclass
+class StepContext:
+    """
+    Per-image state shared by the processing steps
+    """
+    file_path: str
+    name_without_ext: str
+    output_base: str  # Output directory joined with name_without_ext; output paths only append a suffix
+    image: object  # Current processed image (PIL Image)
+    segmented_image: object  # SAM2 segmentation result
+    normal_future: Optional[Future] = None  # Normal map being generated in parallel (gen_pbr only)
+
 class ImageProcessingHandler(FileSystemEventHandler):
     """
     Directory monitoring event handler, triggers processing flow when new images are added
@@ -40,22 +65,71 @@ class ImageProcessingHandler(FileSystemEventHandler):
         self.image_processor = None  # Image processor - 延迟加载
         self.naming_resolver = NamingResolver()
         self.code_sync = CodeSync(config.output_dir, config.cpp_header_dir, config.compiled_dir)
-        # Asset list for generating C++ header files
+        # Asset list for generating C++ header files (ordered), plus a set for O(1) membership checks
         self.asset_list = []
+        self._asset_names = set()
+        self._asset_lock = threading.Lock()  # Guards the asset list and the pending header timer across workers
+        self._header_lock = threading.Lock()  # Serializes header writes so a newer snapshot is never overwritten
+        self._header_timer = None
+        self._header_pending_since = 0.0  # Monotonic time of the first asset waiting for the pending rebuild
+        self._init_lock = threading.Lock()  # Processors are initialized once even when workers start together
+        # Processing step name -> handler; a handler returns the new processed image, or None to keep the current one
+        self._step_table = {
+            "segment": self._step_segment,
+            "align_bottom": self._step_align_bottom,
+            "generate_shadow": self._step_generate_shadow,
+            "resize_square": self._step_resize_square,
+            "sharpen": self._step_sharpen,
+            "make_seamless": self._step_make_seamless,
+            "gen_pbr": self._step_gen_pbr,
+            "gen_lod": self._step_gen_lod,
+            "box_collision": self._step_box_collision,
+            "default_process": self._step_default_process,
+        }
+        # Debounced files: path -> deadline (monotonic time); bursts of events for one file are coalesced
+        self._pending = {}
+        self._pending_cond = threading.Condition()
+        self._closing = False  # Set by close(); the dispatcher submits what is still pending and exits
+        # Independent images are processed in parallel; the pool size follows max_parallel_tasks to bound VRAM use
+        self._pool = ThreadPoolExecutor(max_workers=max(1, config.max_parallel_tasks),
+                                        thread_name_prefix="image-processing")
+        # Normal maps and output PNG encodes run here alongside the image worker; a separate pool avoids
+        # image workers waiting on tasks queued behind themselves
+        self._aux_pool = ThreadPoolExecutor(max_workers=max(1, config.max_parallel_tasks),
+                                            thread_name_prefix="image-aux")
+        # The dispatcher thread hands debounced files to the pool so the watchdog observer thread is never blocked
+        self._worker = threading.Thread(target=self._process_pending, name="image-dispatch", daemon=True)
+        self._worker.start()
         
     def _init_processors(self):
         """
         延迟初始化处理器组件
         """
-        if self.segmenter is None:
-            print("初始化SAM2分割器...")
-            self.segmenter = SAMSegmenter(self.config)
-        if self.normal_generator is None:
-            print("初始化法线贴图生成器...")
-            self.normal_generator = NormalMapGenerator(self.config)
-        if self.image_processor is None:
-            print("初始化图像处理处理器...")
-            self.image_processor = ImageProcessor(self.config)
+        with self._init_lock:
+            if self.segmenter is None:
+                print("初始化SAM2分割器...")
+                from modules.segmentation import SAMSegmenter  # SAM2 segmentation module
+                self.segmenter = SAMSegmenter.shared(self.config)
+            if self.normal_generator is None:
+                print("初始化法线贴图生成器...")
+                from modules.normal_map import NormalMapGenerator
+                self.normal_generator = NormalMapGenerator(self.config)
+            if self.image_processor is None:
+                print("初始化图像处理处理器...")
+                from modules.image_processing import ImageProcessor
+                self.image_processor = ImageProcessor(self.config)
+    
+    def warm_up(self):
+        """
+        Initialize the processors and load the SAM2 model on a background thread,
+        so the first image does not pay the model load; early files wait on the locks
+        """
+        def _warm_up():
+            self._init_processors()
+            if self.segmenter.warm_up():
+                logger.info("SAM2 model loaded, pipeline ready")
+        
+        threading.Thread(target=_warm_up, name="model-warmup", daemon=True).start()
     
     def on_created(self, event):
         """Called when a new file is created"""
@@ -63,18 +137,91 @@ class ImageProcessingHandler(FileSystemEventHandler):
             file_path = event.src_path
             if self._is_supported_image(file_path):
                 logger.info(f"New image file detected: {file_path}")
-                # Add delay to wait for file to be completely written to disk
-                time.sleep(0.5)
-                self._process_image(file_path)
+                self._schedule(file_path)
+    
+    def on_modified(self, event):
+        """Called when a file is modified; only delays files still waiting to be processed"""
+        if not event.is_directory:
+            with self._pending_cond:
+                if event.src_path in self._pending:
+                    self._pending[event.src_path] = time.monotonic() + DEBOUNCE_SECONDS
+    
+    def on_closed(self, event):
+        """Called when a file opened for writing is closed (inotify only); the file is complete, skip the quiet period"""
+        if not event.is_directory:
+            with self._pending_cond:
+                if event.src_path in self._pending:
+                    self._pending[event.src_path] = time.monotonic()
+                    self._pending_cond.notify()
+    
+    def _schedule(self, file_path):
+        """Queue a file for processing once no events have arrived for DEBOUNCE_SECONDS"""
+        with self._pending_cond:
+            if self._closing:
+                logger.warning(f"Pipeline is stopping, ignoring: {file_path}")
+                return
+            self._pending[file_path] = time.monotonic() + DEBOUNCE_SECONDS
+            self._pending_cond.notify()
+    
+    def _process_pending(self):
+        """Dispatcher loop: submit each file to the worker pool once its debounce deadline has passed"""
+        closing = False
+        while not closing:
+            with self._pending_cond:
+                while not self._pending and not self._closing:
+                    self._pending_cond.wait()
+                closing = self._closing
+                now = time.monotonic()
+                if closing:
+                    # 停止时不再等待静默期，剩余文件全部提交；_process_image 会先等待文件写完
+                    ready = list(self._pending)
+                    if ready:
+                        logger.info(f"Submitting {len(ready)} pending file(s) before shutdown")
+                    self._pending.clear()
+                else:
+                    wait = min(self._pending.values()) - now
+                    if wait > 0:
+                        self._pending_cond.wait(wait)
+                        continue
+                    ready = [path for path, deadline in self._pending.items() if deadline <= now]
+                    for path in ready:
+                        del self._pending[path]
+            
+            for file_path in ready:
+                self._pool.submit(self._process_image, file_path)
+    
+    def _wait_until_stable(self, file_path):
+        """
+        Wait until the file size stops changing between two polls
+        
+        Args:
+            file_path: Path of the file to probe
+            
+        Returns:
+            True if the file is stable, False if it disappeared or kept growing until the timeout
+        """
+        deadline = time.monotonic() + STABLE_MAX_WAIT_SECONDS
+        prev_size = -1
+        while time.monotonic() < deadline:
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                return False
+            if size == prev_size and size > 0:
+                return True
+            prev_size = size
+            time.sleep(STABLE_POLL_SECONDS)
+        logger.warning(f"File still being written after {STABLE_MAX_WAIT_SECONDS}s: {file_path}")
+        return False
     
     def _is_supported_image(self, file_path):
         """Check if file is a supported image format"""
-        supported_formats = ['.jpg', '.jpeg', '.png', '.bmp', '.tga']
-        ext = os.path.splitext(file_path)[1].lower()
-        return ext in supported_formats
+        return is_supported_image(os.path.basename(file_path))
     
     def _process_image(self, file_path):
         """Complete image processing workflow"""
+        if not self._wait_until_stable(file_path):
+            return
         try:
             # 延迟初始化处理器组件
             self._init_processors()
@@ -87,18 +234,28 @@ class ImageProcessingHandler(FileSystemEventHandler):
             resource_info = self.naming_resolver.resolve(base_name)
             logger.info(f"Resolved resource info from filename: {base_name} -> Type: {resource_info['resource_type']}, Processes: {resource_info['processes']}")
             
-            # 3. Load original image
-            original_image = self.image_processor.load_image(file_path)
-            if original_image is None:
+            # 3. Load original image (decoded once; segmentation and normal map generation reuse the decode)
+            source_image = self.image_processor.open_image(file_path)
+            if source_image is None:
                 logger.error(f"Failed to load image: {file_path}")
                 return
+            original_image = self.image_processor.to_rgba(source_image)
+            
+            # 法线贴图只依赖原始图像，与SAM2分割并行生成
+            normal_future = None
+            if "gen_pbr" in resource_info['processes']:
+                normal_future = self._aux_pool.submit(self.normal_generator.generate, source_image)
             
             # 4. Perform segmentation using SAM2
             logger.info(f"Performing segmentation using SAM2: {file_path}")
-            processed_image = self.segmenter.segment(file_path)
-            if processed_image is None:
+            segmented_image = self.segmenter.segment(source_image)
+            if segmented_image is None:
                 logger.error(f"Segmentation failed: {file_path}")
                 return
+            output_base = os.path.join(self.config.output_dir, name_without_ext)
+            ctx = StepContext(file_path=file_path, name_without_ext=name_without_ext, output_base=output_base,
+                              image=segmented_image, segmented_image=segmented_image,
+                              normal_future=normal_future)
             
             # 5. Execute processing workflow
             executed_steps = []
@@ -108,69 +265,39 @@ class ImageProcessingHandler(FileSystemEventHandler):
                     logger.info(f"Executing step: {step}")
                     executed_steps.append(step)
                     
-                    if step == "segment":
-                        # Segmentation processing using SAM2
-                        logger.info(f"Performing segmentation using SAM2")
-                        processed_image = self.segmenter.segment(file_path)
-                    elif step == "align_bottom":
-                        # Align to bottom
-                        processed_image = self.image_processor.align_bottom(processed_image)
-                    elif step == "generate_shadow":
-                        # Generate shadow
-                        processed_image = self.image_processor.generate_shadow(processed_image)
-                    elif step == "resize_square":
-                        # Square resize
-                        target_size = self.config.target_size[0]  # Assuming square
-                        processed_image = self.image_processor.resize_square(processed_image, target_size)
-                    elif step == "sharpen":
-                        # Sharpen edges
-                        processed_image = self.image_processor.sharpen(processed_image)
-                    elif step == "make_seamless":
-                        # Make seamless
-                        processed_image = self.image_processor.make_seamless(processed_image)
-                    elif step == "gen_pbr":
-                        # Generate PBR maps (only normal map for now)
-                        logger.info(f"Generating normal map")
-                        normal_map = self.normal_generator.generate(file_path)
-                        if normal_map is not None:
-                            normal_path = os.path.join(self.config.output_dir, f"{name_without_ext}_normal.png")
-                            self.image_processor.save_image(normal_map, normal_path)
-                            logger.info(f"Normal map generated, saved to: {normal_path}")
-                    elif step == "gen_lod":
-                        # Generate LODs
-                        logger.info(f"Generating LODs")
-                        lods = self.image_processor.gen_lod(processed_image)
-                        for i, lod_image in enumerate(lods):
-                            lod_path = os.path.join(self.config.output_dir, f"{name_without_ext}_lod{i}.png")
-                            self.image_processor.save_image(lod_image, lod_path)
-                            logger.info(f"LOD {i} generated, saved to: {lod_path}")
-                    elif step == "box_collision":
-                        # Generate collision box
-                        collision_box = self.image_processor.box_collision(processed_image)
-                        logger.info(f"Collision box generated: {collision_box}")
-                    elif step == "default_process":
-                        # Default processing
-                        logger.info(f"Executing default process")
-                        processed_image = self.image_processor.resize(processed_image, self.config.target_size)
+                    step_fn = self._step_table.get(step)
+                    if step_fn is not None:
+                        result = step_fn(ctx)
+                        if result is not None:
+                            ctx.image = result
                 except Exception as step_error:
                     logger.error(f"Failed to execute step {step}: {str(step_error)}")
             
+            processed_image = ctx.image
+            
+            # Steps 6-8 are independent PNG encodes (which release the GIL), so they run in parallel
+            saves = []
+            
             # 6. Save original image copy
-            original_copy_path = os.path.join(self.config.output_dir, f"{name_without_ext}_original.png")
-            self.image_processor.save_image(original_image, original_copy_path)
-            logger.info(f"Original image saved to: {original_copy_path}")
+            original_copy_path = f"{output_base}_original.png"
+            saves.append((self._aux_pool.submit(self.image_processor.save_image, original_image, original_copy_path),
+                          f"Original image saved to: {original_copy_path}"))
             
             # 7. Save processed image
-            processed_path = os.path.join(self.config.output_dir, f"{name_without_ext}_processed.png")
-            self.image_processor.save_image(processed_image, processed_path)
-            logger.info(f"Processed image saved to: {processed_path}")
+            processed_path = f"{output_base}_processed.png"
+            saves.append((self._aux_pool.submit(self.image_processor.save_image, processed_image, processed_path),
+                          f"Processed image saved to: {processed_path}"))
             
             # 8. Resize to target size (if not already executed)
             if "resize_square" not in executed_steps and "default_process" not in executed_steps:
-                resized_path = os.path.join(self.config.output_dir, f"{name_without_ext}_{self.config.target_size[0]}x{self.config.target_size[1]}.png")
-                resized_image = self.image_processor.resize(processed_image, self.config.target_size)
-                self.image_processor.save_image(resized_image, resized_path)
-                logger.info(f"Image resized and saved to: {resized_path}")
+                target_w, target_h = self.config.target_size
+                resized_path = f"{output_base}_{target_w}x{target_h}.png"
+                saves.append((self._aux_pool.submit(self._resize_and_save, processed_image, resized_path),
+                              f"Image resized and saved to: {resized_path}"))
+            
+            for future, message in saves:
+                future.result()
+                logger.info(message)
             
             # 9. Generate asset metadata
             metadata_path = self.code_sync.generate_metadata(
@@ -182,22 +309,125 @@ class ImageProcessingHandler(FileSystemEventHandler):
             logger.info(f"Asset metadata generated: {metadata_path}")
             
             # 11. Add to asset list for C++ header generation
-            if name_without_ext not in self.asset_list:
-                self.asset_list.append(name_without_ext)
-                # Update C++ header files
-                header_paths = self.code_sync.generate_cpp_header(self.asset_list)
-                for path in header_paths:
-                    logger.info(f"C++ header file updated: {path}")
+            with self._asset_lock:
+                if name_without_ext not in self._asset_names:
+                    self._asset_names.add(name_without_ext)
+                    self.asset_list.append(name_without_ext)
+                    # Update C++ header files (batched with other assets added in the same burst)
+                    self._schedule_header_rebuild()
             
             logger.info(f"Image processing workflow completed: {file_path}")
             
         except Exception as e:
             logger.error(f"Error processing image: {file_path}, Error: {str(e)}")
 
+    def _step_segment(self, ctx):
+        """Segmentation processing using SAM2 (reuses the result from step 4)"""
+        return ctx.segmented_image
+    
+    def _step_align_bottom(self, ctx):
+        """Align to bottom"""
+        return self.image_processor.align_bottom(ctx.image)
+    
+    def _step_generate_shadow(self, ctx):
+        """Generate shadow"""
+        return self.image_processor.generate_shadow(ctx.image)
+    
+    def _step_resize_square(self, ctx):
+        """Square resize"""
+        target_size = self.config.target_size[0]  # Assuming square
+        return self.image_processor.resize_square(ctx.image, target_size)
+    
+    def _step_sharpen(self, ctx):
+        """Sharpen edges"""
+        return self.image_processor.sharpen(ctx.image)
+    
+    def _step_make_seamless(self, ctx):
+        """Make seamless"""
+        return self.image_processor.make_seamless(ctx.image)
+    
+    def _step_gen_pbr(self, ctx):
+        """Generate PBR maps (only normal map for now)"""
+        logger.info(f"Generating normal map")
+        normal_map = ctx.normal_future.result()
+        if normal_map is not None:
+            normal_path = f"{ctx.output_base}_normal.png"
+            self.image_processor.save_image(normal_map, normal_path)
+            logger.info(f"Normal map generated, saved to: {normal_path}")
+    
+    def _step_gen_lod(self, ctx):
+        """Generate LODs"""
+        logger.info(f"Generating LODs")
+        lods = self.image_processor.gen_lod(ctx.image)
+        for i, lod_image in enumerate(lods):
+            lod_path = f"{ctx.output_base}_lod{i}.png"
+            self.image_processor.save_image(lod_image, lod_path)
+            logger.info(f"LOD {i} generated, saved to: {lod_path}")
+    
+    def _step_box_collision(self, ctx):
+        """Generate collision box"""
+        collision_box = self.image_processor.box_collision(ctx.image)
+        logger.info(f"Collision box generated: {collision_box}")
+    
+    def _step_default_process(self, ctx):
+        """Default processing"""
+        logger.info(f"Executing default process")
+        return self.image_processor.resize(ctx.image, self.config.target_size)
+    
+    def _resize_and_save(self, image, file_path):
+        """Resize an image to the configured target size and save it"""
+        resized_image = self.image_processor.resize(image, self.config.target_size)
+        return self.image_processor.save_image(resized_image, file_path)
+    
+    def _schedule_header_rebuild(self):
+        """(Re)start the header rebuild timer after a new asset (caller holds _asset_lock)"""
+        now = time.monotonic()
+        if self._header_timer is None:
+            self._header_pending_since = now
+        elif now - self._header_pending_since < HEADER_REBUILD_MAX_DELAY:
+            self._header_timer.cancel()
+        else:
+            # 长时间连续导入时不再推迟，让已排定的重建按时写出
+            return
+        self._header_timer = threading.Timer(HEADER_REBUILD_DELAY, self._rebuild_header)
+        self._header_timer.daemon = True
+        self._header_timer.start()
+    
+    def _rebuild_header(self):
+        """Regenerate the C++ header files from a snapshot of the asset list"""
+        with self._header_lock:
+            with self._asset_lock:
+                # A timer cancelled after it already fired must not clear its replacement
+                if self._header_timer is threading.current_thread():
+                    self._header_timer = None
+                assets = list(self.asset_list)
+            if not assets:
+                return
+            header_paths = self.code_sync.generate_cpp_header(assets)
+            for path in header_paths:
+                logger.info(f"C++ header file updated: {path}")
+    
+    def close(self):
+        """Process files still waiting for their debounce, wait for queued images to finish and write any pending header update"""
+        # 先停止分发线程，确保不会在线程池关闭后继续提交
+        with self._pending_cond:
+            self._closing = True
+            self._pending_cond.notify()
+        self._worker.join()
+        self._pool.shutdown(wait=True)
+        self._aux_pool.shutdown(wait=True)
+        with self._asset_lock:
+            timer, self._header_timer = self._header_timer, None
+        if timer is not None:
+            timer.cancel()
+            self._rebuild_header()
+
 def main():
     """Main function, starts the pipeline"""
+    from watchdog.observers import Observer
+    
     # Load configuration
-    config = Config()
+    config = Config.get()
     
     # Create output directories
     os.makedirs(config.output_dir, exist_ok=True)
@@ -210,6 +440,7 @@ def main():
     
     # Create event handler
     event_handler = ImageProcessingHandler(config)
+    event_handler.warm_up()
     
     # Create observer
     observer = Observer()
@@ -218,14 +449,20 @@ def main():
     # Start observer
     observer.start()
     
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        observer.stop()
-        logger.info("AmberPipeline AI stopped")
+    # Block until a stop signal arrives instead of waking up periodically
+    stop_event = threading.Event()
+    for sig_name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, sig_name):
+            signal.signal(getattr(signal, sig_name), lambda *_: stop_event.set())
+    # Windows 上不带超时的等待无法被 Ctrl+C 打断，因此保留超时
+    wait_timeout = 1 if os.name == "nt" else None
+    while not stop_event.wait(wait_timeout):
+        pass
     
+    observer.stop()
     observer.join()
+    event_handler.close()
+    logger.info("AmberPipeline AI stopped")
 
 def start_gui():
     """
@@ -9,6 +9,22 @@ import concurrent.futures
 from PIL import Image, ImageOps, ImageDraw, ImageFilter
 import numpy as np
 
+# Image file extensions handled by the pipeline (lowercase, without dot)
+SUPPORTED_IMAGE_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'bmp', 'tga', 'webp', 'tif', 'tiff'})
+
+def is_supported_image(file_name: str) -> bool:
+    """
+    Check by extension whether a file is a supported image, without opening it
+    
+    Args:
+        file_name: File name or path
+    
+    Returns:
+        True if the extension is a supported image format
+    """
+    _, dot, ext = file_name.rpartition('.')
+    return bool(dot) and ext.lower() in SUPPORTED_IMAGE_EXTENSIONS
+
 class ImageProcessor:
     """Image Processing Class"""
     
@@ -21,26 +37,54 @@ class ImageProcessor:
         """
         self.config = config
     
-    def load_image(self, file_path: str) -> Image.Image:
+    def open_image(self, file_path: str) -> Image.Image:
         """
-        Load image
+        Decode image in its original mode, so one decode can be shared by several processing steps
         
         Args:
             file_path: Image file path
         
         Returns:
-            Loaded Image object, returns None if loading fails
+            Fully decoded Image object, returns None if loading fails
         """
         try:
             image = Image.open(file_path)
-            # Ensure image is in RGBA format
-            if image.mode != 'RGBA':
-                image = image.convert('RGBA')
+            # Decode now: a lazily loaded image must not be loaded concurrently from several threads
+            image.load()
             return image
         except Exception as e:
             print(f"Failed to load image: {file_path}, error message: {str(e)}")
             return None
     
+    def load_image(self, file_path: str) -> Image.Image:
+        """
+        Load image
+        
+        Args:
+            file_path: Image file path
+        
+        Returns:
+            Loaded Image object, returns None if loading fails
+        """
+        image = self.open_image(file_path)
+        if image is None:
+            return None
+        return self.to_rgba(image)
+    
+    def to_rgba(self, image: Image.Image) -> Image.Image:
+        """
+        Ensure image is in RGBA format
+        
+        Args:
+            image: Image object
+        
+        Returns:
+            RGBA Image object (the input itself if already RGBA)
+        """
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        return image
+    
     def save_image(self, image: Image.Image, file_path: str) -> bool:
         """
         Save image
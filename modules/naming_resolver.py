@@ -6,6 +6,12 @@ Supports four-segment naming convention: [prefix]_[material_name]_[property/vari
 """
 
 import os
+import re
+
+# [prefix]_[material_name]_[rest]; rest holds attribute/variant and version
+_NAME_RE = re.compile(r'^(?P<prefix>[^_]*)(?:_(?P<material>[^_]*)(?:_(?P<rest>.*))?)?$', re.S)
+# Trailing version segment (v01, v1, ...) of rest
+_VERSION_RE = re.compile(r'(?:^|_)(v\d+)$')
 
 class NamingResolver:
     """
@@ -38,6 +44,8 @@ class NamingResolver:
             "_M": {"name": "Mask", "description": "Mask", "engine_usage": "Used to implement dynamic effects like blood stains, snow, etc."}
         }
         
+        self._texture_suffix_re = re.compile('(?:' + '|'.join(map(re.escape, self.texture_suffixes)) + ')$')
+        
         # Merge custom rules
         self.rules = self.default_rules.copy()
         if custom_rules:
@@ -57,33 +65,32 @@ class NamingResolver:
         name_without_ext, ext = os.path.splitext(filename)
         ext = ext.lower()
         
-        # Split filename by underscore
-        parts = name_without_ext.split('_')
-        
-        # Parse each component
-        prefix = parts[0] if len(parts) > 0 else ""
-        material_name = parts[1] if len(parts) > 1 else ""
+        # Parse each component with one precompiled match instead of split + join
+        match = _NAME_RE.match(name_without_ext)
+        prefix = match.group('prefix')
+        material_name = match.group('material') or ""
+        rest = match.group('rest')
         
         # Process attributes/variants and version
         attribute = ""
         version = ""
         
-        if len(parts) > 2:
-            # 检查最后一部分是否为版本号（v01, v1.0等格式）
-            if len(parts[-1]) >= 2 and parts[-1][0] == 'v' and parts[-1][1:].isdigit():
-                version = parts[-1]
+        if rest is not None:
+            # 检查最后一部分是否为版本号（v01, v1等格式）
+            version_match = _VERSION_RE.search(rest)
+            if version_match:
+                version = version_match.group(1)
                 # 属性/变体是中间部分
-                attribute = '_'.join(parts[2:-1])
+                attribute = rest[:version_match.start()]
             else:
                 # 没有版本号，剩余部分都是属性/变体
-                attribute = '_'.join(parts[2:])
+                attribute = rest
         
         # Check if contains texture suffix
         texture_suffix = ""
-        for suffix in self.texture_suffixes.keys():
-            if name_without_ext.endswith(suffix):
-                texture_suffix = suffix
-                break
+        match = self._texture_suffix_re.search(name_without_ext)
+        if match:
+            texture_suffix = match.group(0)
         
         return {
             "full_name": filename,
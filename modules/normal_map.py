@@ -5,6 +5,7 @@ Generates PBR normal maps from 2D images, supporting multiple generation algorit
 """
 
 import os
+from typing import Union
 import numpy as np
 from PIL import Image, ImageFilter
 
@@ -20,20 +21,20 @@ class NormalMapGenerator:
         """
         self.config = config
     
-    def generate(self, image_path: str, strength: float = None) -> Image.Image:
+    def generate(self, image_path: Union[str, Image.Image], strength: float = None) -> Image.Image:
         """
         Generate normal map from image
         
         Args:
-            image_path: Image file path
+            image_path: Image file path, or an already decoded Image object
             strength: Normal strength, overrides the value in configuration file
         
         Returns:
             Generated normal map Image object, returns None if generation fails
         """
         try:
-            # Load image
-            image = Image.open(image_path)
+            # Load image (skip decoding when the caller already has it)
+            image = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
             
             # Use specified strength or the one from configuration file
             current_strength = strength if strength is not None else self.config.normal_strength
@@ -6,6 +6,8 @@ Separates background from target objects
 """
 
 import os
+import threading
+from typing import Union
 import numpy as np
 from PIL import Image
 import torch
@@ -20,6 +22,29 @@ from hydra import initialize
 class SAMSegmenter:
     """SAM2 Semantic Segmentation Class"""
     
+    # Shared instances keyed by (model path, device), so the weights are loaded once per process
+    _shared = {}
+    _shared_lock = threading.Lock()
+    
+    @classmethod
+    def shared(cls, config) -> "SAMSegmenter":
+        """
+        Get the process-wide segmenter for the configured model path and device
+        
+        Args:
+            config: Configuration object
+        
+        Returns:
+            SAMSegmenter instance
+        """
+        key = (config.sam_model_path, config.sam_device)
+        with cls._shared_lock:
+            segmenter = cls._shared.get(key)
+            if segmenter is None:
+                segmenter = cls(config)
+                cls._shared[key] = segmenter
+            return segmenter
+    
     def __init__(self, config):
         """
         Initialize SAM2 Segmenter
@@ -32,6 +57,8 @@ class SAMSegmenter:
         self.sam2_model = None
         self.sam2_predictor = None
         self._model_initialized = False
+        # The predictor holds the current image, so set_image + predict must not interleave
+        self._predict_lock = threading.RLock()
     
     def _init_sam_model(self):
         """
@@ -124,25 +151,35 @@ class SAMSegmenter:
             self._model_initialized = False
             return False
     
-    def segment(self, image_path: str) -> Image.Image:
+    def warm_up(self) -> bool:
+        """
+        Load the SAM2 model ahead of the first segmentation request
+        
+        Returns:
+            True if the model is ready, False if initialization failed
+        """
+        with self._predict_lock:
+            return self._model_initialized or self._init_sam_model()
+    
+    def segment(self, image_path: Union[str, Image.Image]) -> Image.Image:
         """
         Perform automatic semantic segmentation (background removal) using SAM2
         
         Args:
-            image_path: Image file path
+            image_path: Image file path, or an already decoded Image object
         
         Returns:
             Segmented Image object with transparent background, or None if failed
         """
         # Initialize SAM2 model if not already initialized
-        if not self._model_initialized:
-            if not self._init_sam_model():
+        with self._predict_lock:
+            if not self._model_initialized and not self._init_sam_model():
                 print("SAM2 model initialization failed, cannot perform segmentation")
                 return None
         
         try:
-            # Load image
-            image = Image.open(image_path)
+            # Load image (skip decoding when the caller already has it)
+            image = image_path if isinstance(image_path, Image.Image) else Image.open(image_path)
             # Convert to RGB format
             if image.mode == 'RGBA':
                 image = image.convert('RGB')
@@ -154,19 +191,20 @@ class SAMSegmenter:
             
             # Perform SAM2 segmentation
             print("Using SAM2 for segmentation")
-            self.sam2_predictor.set_image(image_np)
-            
-            # Use center point as prompt to get the main object
-            h, w, _ = image_np.shape
-            center_point = np.array([[w // 2, h // 2]])
-            center_label = np.array([1])  # 1 for foreground
-            
-            # Generate masks
-            masks, scores, logits = self.sam2_predictor.predict(
-                point_coords=center_point,
-                point_labels=center_label,
-                multimask_output=True
-            )
+            with self._predict_lock:
+                self.sam2_predictor.set_image(image_np)
+            
+                # Use center point as prompt to get the main object
+                h, w, _ = image_np.shape
+                center_point = np.array([[w // 2, h // 2]])
+                center_label = np.array([1])  # 1 for foreground
+            
+                # Generate masks
+                masks, scores, logits = self.sam2_predictor.predict(
+                    point_coords=center_point,
+                    point_labels=center_label,
+                    multimask_output=True
+                )
             
             # Select the best mask based on confidence score
             if masks is not None and len(masks) > 0:
@@ -202,12 +240,6 @@ class SAMSegmenter:
         Returns:
             Segmented Image object with transparent background, or None if failed
         """
-        # Initialize SAM2 model if not already initialized
-        if not self._model_initialized:
-            if not self._init_sam_model():
-                print("SAM2 model initialization failed, cannot perform segmentation")
-                return None
-        
         try:
             # Load image
             image = Image.open(image_path)
@@ -217,21 +249,46 @@ class SAMSegmenter:
                 image = image.convert('RGB')
             
             image_np = np.array(image)
-            
-            # Convert point format
-            input_points = np.array(points)
-            input_labels = np.array(point_labels)
+        except Exception as e:
+            print(f"Failed to segment image with point prompts: {image_path}, error: {str(e)}")
+            return None
+        
+        return self.segment_with_points_array(image_np, points, point_labels)
+    
+    def segment_with_points_array(self, image_np: np.ndarray, points, point_labels) -> Image.Image:
+        """
+        Perform semantic segmentation with point prompts on an in-memory RGB image
+        
+        Args:
+            image_np: RGB image array (H, W, 3)
+            points: Point coordinates, (N, 2) array or list of (x, y)
+            point_labels: Point labels, (N,) array or list, 0 for background, 1 for foreground
+        
+        Returns:
+            Segmented Image object with transparent background, or None if failed
+        """
+        # Initialize SAM2 model if not already initialized
+        with self._predict_lock:
+            if not self._model_initialized and not self._init_sam_model():
+                print("SAM2 model initialization failed, cannot perform segmentation")
+                return None
+        
+        try:
+            # Convert point format (no copy when already an ndarray)
+            input_points = np.asarray(points)
+            input_labels = np.asarray(point_labels)
             
             # Perform SAM2 segmentation with points
             print("Using SAM2 for point-based segmentation")
-            self.sam2_predictor.set_image(image_np)
+            with self._predict_lock:
+                self.sam2_predictor.set_image(image_np)
             
-            # Generate masks
-            masks, scores, logits = self.sam2_predictor.predict(
-                point_coords=input_points,
-                point_labels=input_labels,
-                multimask_output=True
-            )
+                # Generate masks
+                masks, scores, logits = self.sam2_predictor.predict(
+                    point_coords=input_points,
+                    point_labels=input_labels,
+                    multimask_output=True
+                )
             
             # Select best mask
             best_idx = np.argmax(scores)
@@ -247,5 +304,5 @@ class SAMSegmenter:
             return result_image
             
         except Exception as e:
-            print(f"Failed to segment image with point prompts: {image_path}, error: {str(e)}")
-            return None
\ No newline at end of file
+            print(f"Failed to segment image with point prompts, error: {str(e)}")
+            return None
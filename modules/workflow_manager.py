@@ -5,27 +5,27 @@ Automatically processes files in the monitored directory based on four-segment n
 """
 
 import os
-import sys
 import time
 import threading
 import logging
 import json
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 from PIL import Image
 
 # Import modules
-from modules.segmentation import SAMSegmenter
-from modules.image_processing import ImageProcessor
+from modules.image_processing import ImageProcessor, is_supported_image
 from modules.naming_resolver import NamingResolver
 from modules.normal_map import NormalMapGenerator
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging is configured by the entry point (server/main); configuring the root logger
+# here on import would pre-empt the entry point's basicConfig
 logger = logging.getLogger(__name__)
 
+# Upper bound for max_parallel_tasks, also the size of the processing thread pool
+MAX_PARALLEL_TASKS_LIMIT = 10
+
 class WorkflowManager:
     """
     Automatic Workflow Manager
@@ -42,7 +42,9 @@ class WorkflowManager:
         self.config = config
         self.running = False
         self.monitor_thread = None
-        self.processing_queue = []
+        self.executor = None  # Worker pool for file processing, created when monitoring starts
+        self._stop_event = threading.Event()  # Wakes the monitor loop immediately on stop
+        self.processing_queue = {}  # Files being processed, filename -> in-flight count (insertion-ordered)
         self.processed_files = []
         self.failed_files = []
         self.current_process = None
@@ -51,6 +53,10 @@ class WorkflowManager:
         self.max_parallel_tasks = 4  # Default value to prevent VRAM overflow
         self.current_running_tasks = 0
         self.batch_condition = threading.Condition()  # 使用Condition替代Lock，更适合等待条件变化
+        # 状态版本号，每次修改状态后递增；get_workflow_status 在版本不变时复用上次的结果
+        self._status_versions = itertools.count(1)
+        self._status_version = 0
+        self._status_snapshot = (None, None)  # (status version, status dict) of the last get_workflow_status call
         
         # Initialize components - SAM模型延迟加载
         self.naming_resolver = NamingResolver()
@@ -60,6 +66,92 @@ class WorkflowManager:
         
         # Ensure directories exist
         self._ensure_directories()
+        
+        # 已处理文件索引（按路径、修改时间、大小），开启 persist_processed_index 时重启后跳过未变化的文件
+        # 索引文件每行一条记录，只追加写入；加载时清理已删除或已修改文件的记录
+        self.processed_index_path = os.path.join(config.temp_dir, "processed_index.jsonl")
+        self._processed_index_lock = threading.Lock()
+        self._processed_index = self._load_processed_index() if config.persist_processed_index else set()
+    
+    def _load_processed_index(self) -> set:
+        """
+        Load the persistent index of processed files, dropping entries whose file was removed or changed
+        
+        Returns:
+            Set of file keys
+        """
+        entries = set()
+        total = 0
+        try:
+            with open(self.processed_index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        path, mtime_ns, size = json.loads(line)
+                    except ValueError:
+                        continue
+                    total += 1
+                    entries.add((path, mtime_ns, size))
+        except OSError:
+            return set()
+        
+        index = set()
+        for path, mtime_ns, size in entries:
+            try:
+                if self._file_key(path, os.stat(path)) == (path, mtime_ns, size):
+                    index.add((path, mtime_ns, size))
+            except OSError:
+                pass
+        
+        # Compact the file once when stale or duplicate entries were found
+        if len(index) != total:
+            self._write_processed_index(index)
+        return index
+    
+    def _write_processed_index(self, index: set):
+        """
+        Rewrite the persistent index file with the given entries
+        
+        Args:
+            index: Set of file keys
+        """
+        try:
+            with open(self.processed_index_path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(list(key)) + "\n" for key in index)
+        except OSError as e:
+            logger.warning(f"Failed to save processed index: {str(e)}")
+    
+    @staticmethod
+    def _file_key(path: str, stat_result: os.stat_result) -> tuple:
+        """
+        Build the index key of a file version
+        
+        Args:
+            path: File path
+            stat_result: Result of os.stat for the file
+            
+        Returns:
+            Tuple of (absolute path, mtime in ns, size)
+        """
+        return (os.path.abspath(path), stat_result.st_mtime_ns, stat_result.st_size)
+    
+    def _mark_processed(self, key: tuple):
+        """
+        Record a processed file version, appending it to the persistent index when enabled
+        
+        Args:
+            key: File key from _file_key
+        """
+        if not self.config.persist_processed_index:
+            return
+        with self._processed_index_lock:
+            if key in self._processed_index:
+                return
+            self._processed_index.add(key)
+            try:
+                with open(self.processed_index_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(list(key)) + "\n")
+            except OSError as e:
+                logger.warning(f"Failed to save processed index: {str(e)}")
     
     def _ensure_directories(self):
         """
@@ -77,6 +169,13 @@ class WorkflowManager:
             os.makedirs(directory, exist_ok=True)
             logger.info(f"Ensured directory exists: {directory}")
     
+    def _status_changed(self):
+        """
+        Invalidate the cached workflow status; call after every state change
+        """
+        # itertools.count 的 next 在多线程下不会重复取号
+        self._status_version = next(self._status_versions)
+    
     def start_monitoring(self):
         """
         Start monitoring the watch directory
@@ -89,11 +188,15 @@ class WorkflowManager:
         if not self.models_loaded:
             logger.info("Loading AI models...")
             from modules.segmentation import SAMSegmenter
-            self.sam_segmenter = SAMSegmenter(self.config)
+            self.sam_segmenter = SAMSegmenter.shared(self.config)
             self.models_loaded = True
             logger.info("AI models loaded successfully")
         
         self.running = True
+        self._status_changed()
+        self._stop_event.clear()
+        # 文件在工作线程中处理，监控线程不被单个文件阻塞；并发数仍由 batch_condition 按 max_parallel_tasks 限制
+        self.executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_TASKS_LIMIT, thread_name_prefix="workflow")
         self.monitor_thread = threading.Thread(target=self._monitor_directory, daemon=True)
         self.monitor_thread.start()
         logger.info(f"Started monitoring directory: {self.config.watch_dir}")
@@ -103,8 +206,14 @@ class WorkflowManager:
         Stop monitoring the watch directory
         """
         self.running = False
+        self._status_changed()
+        self._stop_event.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
+        if self.executor:
+            # 取消尚未开始的文件，正在处理的文件继续完成
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
         logger.info("Stopped monitoring directory")
     
     def _monitor_directory(self):
@@ -115,23 +224,33 @@ class WorkflowManager:
         
         while self.running:
             try:
-                # Get all files in the watch directory
-                files = [f for f in os.listdir(self.config.watch_dir) 
-                        if os.path.isfile(os.path.join(self.config.watch_dir, f))]
-                
+                # Get all files in the watch directory (one scandir pass, no per-file isfile/stat for known files)
+                with os.scandir(self.config.watch_dir) as entries:
+                    new_entries = [entry for entry in entries
+                                   if entry.name not in processed_filenames and entry.is_file()]
+
                 # Process new files
-                for filename in files:
-                    if filename not in processed_filenames:
-                        logger.info(f"New file detected: {filename}")
-                        self.process_file(filename)
+                for entry in new_entries:
+                    filename = entry.name
+                    # 非图像文件只按扩展名判断，不交给图像解码器；上次运行中已处理且未修改的文件直接跳过
+                    if not is_supported_image(filename):
+                        processed_filenames.add(filename)
+                        continue
+                    if self._processed_index and self._file_key(entry.path, entry.stat()) in self._processed_index:
+                        logger.info(f"Skipping unchanged file processed in a previous run: {filename}")
                         processed_filenames.add(filename)
+                        continue
+                    
+                    logger.info(f"New file detected: {filename}")
+                    self.executor.submit(self.process_file, filename)
+                    processed_filenames.add(filename)
                 
-                # Sleep for a short interval
-                time.sleep(1)
+                # Wait for the next scan; returns at once when monitoring is stopped
+                self._stop_event.wait(1)
             
             except Exception as e:
                 logger.error(f"Error monitoring directory: {str(e)}")
-                time.sleep(5)
+                self._stop_event.wait(5)
     
     def process_file(self, filename: str) -> Dict[str, Any]:
         """
@@ -144,7 +263,9 @@ class WorkflowManager:
             Dictionary containing processing results
         """
         # Add to processing queue
-        self.processing_queue.append(filename)
+        with self.batch_condition:
+            self.processing_queue[filename] = self.processing_queue.get(filename, 0) + 1
+            self._status_changed()
         
         result = {
             "filename": filename,
@@ -168,8 +289,13 @@ class WorkflowManager:
                 
                 # 增加当前运行任务计数
                 self.current_running_tasks += 1
+                self._status_changed()
                 logger.info(f"Started processing file: {filename} (Tasks: {self.current_running_tasks}/{self.max_parallel_tasks})")
             
+            # 处理前记录文件版本，处理期间文件被修改时下次仍会重新处理
+            input_path = os.path.join(self.config.watch_dir, filename)
+            file_key = self._file_key(input_path, os.stat(input_path))
+            
             # Resolve processing flow based on filename
             file_info = self.naming_resolver.resolve(filename)
             logger.info(f"File info: {file_info}")
@@ -183,6 +309,8 @@ class WorkflowManager:
             
             # Add to processed files
             self.processed_files.append(result)
+            self._status_changed()
+            self._mark_processed(file_key)
             
             logger.info(f"Successfully processed file: {filename}")
             
@@ -196,18 +324,23 @@ class WorkflowManager:
             
             # Add to failed files
             self.failed_files.append(result)
+            self._status_changed()
         finally:
             # 使用Condition确保线程安全地减少当前运行任务计数并通知等待的线程
             with self.batch_condition:
                 if self.current_running_tasks > 0:
                     self.current_running_tasks -= 1
+                    self._status_changed()
                 logger.info(f"Finished processing file: {filename} (Tasks: {self.current_running_tasks}/{self.max_parallel_tasks})")
                 # 通知等待的线程有任务槽位可用
                 self.batch_condition.notify()
             
             # Remove from processing queue
-            if filename in self.processing_queue:
-                self.processing_queue.remove(filename)
+            with self.batch_condition:
+                remaining = self.processing_queue.pop(filename, 1) - 1
+                if remaining > 0:
+                    self.processing_queue[filename] = remaining
+                self._status_changed()
         
         return result
     
@@ -322,14 +455,23 @@ class WorkflowManager:
         Get the current workflow status
         
         Returns:
-            Dictionary containing workflow status information
+            Dictionary containing workflow status information; a new dict is
+            returned on every call, but its nested lists are shared between
+            calls while nothing has changed and must be treated as read-only
         """
+        # 状态轮询很频繁，版本号不变时复用上次构建的结果，不再复制已处理列表
+        # 先读版本号再构建：构建期间发生的修改会递增版本号，下次调用时重新构建
+        version = self._status_version
+        last_version, last_status = self._status_snapshot
+        if version == last_version:
+            return dict(last_status)
+        
         total_files = len(self.processed_files) + len(self.failed_files)
         success_rate = (len(self.processed_files) / total_files * 100) if total_files > 0 else 0.0
         
-        return {
+        status = {
             "is_running": self.running,
-            "processing_queue": self.processing_queue.copy(),
+            "processing_queue": list(self.processing_queue),
             "processed_files": self.processed_files.copy(),
             "failed_files": self.failed_files.copy(),
             "total_files": total_files,
@@ -339,12 +481,20 @@ class WorkflowManager:
                 "current_running_tasks": self.current_running_tasks
             }
         }
+        self._status_snapshot = (version, status)
+        return dict(status)
     
     def clear_processed_files(self):
         """
         Clear the list of processed files
         """
         self.processed_files = []
+        self._status_changed()
+        # 清除历史后，这些文件在下次启动监控时应重新处理
+        with self._processed_index_lock:
+            if self._processed_index:
+                self._processed_index = set()
+                self._write_processed_index(self._processed_index)
         logger.info("Cleared processed files list")
     
     def clear_failed_files(self):
@@ -352,6 +502,7 @@ class WorkflowManager:
         Clear the list of failed files
         """
         self.failed_files = []
+        self._status_changed()
         logger.info("Cleared failed files list")
     
     def set_batch_config(self, max_parallel_tasks: int) -> Dict[str, Any]:
@@ -366,10 +517,11 @@ class WorkflowManager:
         """
         try:
             # Validate the value
-            if not isinstance(max_parallel_tasks, int) or max_parallel_tasks < 1 or max_parallel_tasks > 10:
-                raise ValueError("max_parallel_tasks must be an integer between 1 and 10")
+            if not isinstance(max_parallel_tasks, int) or max_parallel_tasks < 1 or max_parallel_tasks > MAX_PARALLEL_TASKS_LIMIT:
+                raise ValueError(f"max_parallel_tasks must be an integer between 1 and {MAX_PARALLEL_TASKS_LIMIT}")
             
             self.max_parallel_tasks = max_parallel_tasks
+            self._status_changed()
             logger.info(f"Batch configuration updated: max_parallel_tasks = {max_parallel_tasks}")
             
             return {
@@ -461,12 +613,17 @@ class WorkflowManager:
 
 # For testing purposes
 if __name__ == "__main__":
-    # Import config
-    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    # Import config (run as `python -m modules.workflow_manager` from the project root, which is already on sys.path)
     from config import Config
     
     # Initialize config
-    config = Config()
+    config = Config.get()
     
     # Initialize workflow manager
     workflow_manager = WorkflowManager(config)